@@ -8,56 +8,123 @@ Usage: llmi ask "your question here" [--file file_path]
 import os
 import sys
 import json
-import subprocess
-import requests
-from openai import OpenAI
+import re
+import stat
+import functools
 from pathlib import Path
 import time
 
+# 缓存与技能目录，启动时计算一次
+CACHE_DIR = Path.home() / ".cache" / "llmi"
+SKILLS_DIR = Path.home() / ".llm-inline" / "skills"
+LAST_COMMAND_FILE = CACHE_DIR / "last_command"
 
-import sqlite3
-import datetime
-import uuid
+# 可选使用orjson加速JSON读写，未安装时回退到标准库
+try:
+    import orjson
+
+    def _json_loads(data):
+        return orjson.loads(data)
+
+    def _json_dumps(obj, indent: bool = False) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+except ImportError:
+    def _json_loads(data):
+        return json.loads(data)
+
+    def _json_dumps(obj, indent: bool = False) -> bytes:
+        return json.dumps(obj, indent=2 if indent else None, ensure_ascii=False).encode('utf-8')
 
 # --- Context Management ---
 
 class ContextManager:
+    # Rewrite the log once it holds this many lines beyond max_history
+    COMPACT_SLACK = 50
+    # Initial tail window read by load_history
+    TAIL_BYTES = 64 * 1024
+
     def __init__(self, session_id: str):
         self.session_id = session_id
-        self.cache_dir = Path(os.path.expanduser("~/.cache/llmi/sessions"))
+        self.cache_dir = CACHE_DIR / "sessions"
         self.cache_dir.mkdir(parents=True, exist_ok=True)
-        self.history_file = self.cache_dir / f"{session_id}.json"
+        # Append-only JSONL: one message per line
+        self.history_file = self.cache_dir / f"{session_id}.jsonl"
         self.max_history = 20  # Keep last 20 messages (10 interactions)
+        self._stored_lines = 0
 
     def load_history(self) -> list:
         if not self.history_file.exists():
             return []
+        history = []
+        torn = False
         try:
-            with open(self.history_file, 'r', encoding='utf-8') as f:
-                history = json.load(f)
-            return history
+            lines, truncated = self._read_tail_lines()
+            for line in lines:
+                try:
+                    history.append(_json_loads(line))
+                except ValueError:
+                    # A torn line from an interrupted append
+                    torn = True
         except Exception:
             return []
+        # Force a rewrite on the next append so new lines don't join a torn one,
+        # and so an oversized log left behind gets cut back down
+        if torn or truncated:
+            self._stored_lines = self.max_history + self.COMPACT_SLACK
+        else:
+            self._stored_lines = len(history)
+        return history[-self.max_history:]
 
-    def save_history(self, messages: list):
-        # Filter out system messages to avoid duplication if we re-construct context
-        # But actually we want to store user and assistant messages.
-        # We'll expect 'messages' to be the full list, so we slice or filter.
-        
+    def _read_tail_lines(self) -> tuple:
+        """
+        Read only the end of the log, widening the window until it holds more
+        than max_history lines or reaches the start of the file.
+        Returns (lines, truncated) where truncated means earlier lines were skipped.
+        """
+        with open(self.history_file, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            window = self.TAIL_BYTES
+            while True:
+                start = max(0, size - window)
+                f.seek(start)
+                lines = [line for line in f.read().split(b"\n") if line]
+                if start == 0:
+                    return lines, False
+                # The first line is most likely cut mid-way
+                lines = lines[1:]
+                if len(lines) > self.max_history:
+                    return lines, True
+                window *= 4
+
+    def append_messages(self, messages: list):
+        """Append new user/assistant messages without rewriting earlier turns."""
         # Strategy: Store only User and Assistant messages.
-        history_to_save = [m for m in messages if m['role'] in ('user', 'assistant')]
-        
-        # Truncate
-        if len(history_to_save) > self.max_history:
-            history_to_save = history_to_save[-self.max_history:]
-            
+        to_append = [m for m in messages if m['role'] in ('user', 'assistant')]
+        if not to_append:
+            return
+
         try:
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(history_to_save, f, ensure_ascii=False, indent=2)
+            if self._stored_lines + len(to_append) > self.max_history + self.COMPACT_SLACK:
+                self._compact(to_append)
+                return
+            lines = b"".join(_json_dumps(m) + b"\n" for m in to_append)
+            with open(self.history_file, 'ab') as f:
+                f.write(lines)
+            self._stored_lines += len(to_append)
         except Exception as e:
             # Silently fail or log debug
             pass
 
+    def _compact(self, new_messages: list):
+        """Rewrite the log keeping only the last max_history messages."""
+        history = self.load_history() + new_messages
+        history = history[-self.max_history:]
+        tmp_file = self.history_file.with_name(f"{self.history_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, 'wb') as f:
+            f.write(b"".join(_json_dumps(m) + b"\n" for m in history))
+        os.replace(tmp_file, self.history_file)
+        self._stored_lines = len(history)
+
     def clear_history(self):
         if self.history_file.exists():
             try:
@@ -68,23 +135,204 @@ class ContextManager:
 
 # --- Terminal Reading ---
 
+def _spawn_capture(argv: list) -> tuple:
+    """
+    Lightweight subprocess.run() for short-lived helpers (tmux, osascript):
+    posix_spawn the command with stdout/stderr pipes and return
+    (returncode, stdout, stderr) as bytes.
+    """
+    if not hasattr(os, 'posix_spawnp'):
+        import subprocess
+        result = subprocess.run(argv, capture_output=True)
+        return result.returncode, result.stdout, result.stderr
+
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+    try:
+        pid = os.posix_spawnp(argv[0], argv, os.environ, file_actions=[
+            (os.POSIX_SPAWN_DUP2, out_w, 1),
+            (os.POSIX_SPAWN_DUP2, err_w, 2),
+        ])
+    except OSError:
+        os.close(out_r)
+        os.close(err_r)
+        raise
+    finally:
+        os.close(out_w)
+        os.close(err_w)
+
+    # stderr of these helpers is tiny, so draining stdout first cannot block
+    outputs = []
+    for fd in (out_r, err_r):
+        chunks = []
+        with open(fd, 'rb', closefd=True) as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                chunks.append(chunk)
+        outputs.append(b''.join(chunks))
+
+    _, status = os.waitpid(pid, 0)
+    return os.waitstatus_to_exitcode(status), outputs[0], outputs[1]
+
+
 class TerminalReader:
+    # Snapshots younger than this are reused by back-to-back llmi calls
+    CACHE_TTL = 2.0
+    # Upper bound on captured lines, whatever the caller asks for
+    MAX_LINES = 200
+
+    # AppleScript handler returning the last maxLines paragraphs (trailing blank
+    # ones skipped), so the tail is cut before the text ever reaches Python
+    _TAIL_HANDLER = '''
+            on tailText(termText, maxLines)
+                set n to count of paragraphs of termText
+                repeat while n > 0
+                    if paragraph n of termText is not "" then exit repeat
+                    set n to n - 1
+                end repeat
+                if n = 0 then return ""
+                set startIdx to n - maxLines + 1
+                if startIdx < 1 then set startIdx to 1
+                set AppleScript's text item delimiters to linefeed
+                return (paragraphs startIdx thru n of termText) as text
+            end tailText
+            '''
+
+    @staticmethod
+    def _snapshot_dir():
+        """
+        Private per-user runtime dir for snapshots, or None if it cannot be trusted.
+        Scrollback may contain secrets, so it stays out of the persistent ~/.cache
+        tree. Under a shared /tmp another user could pre-create the path, so it is
+        only used when it is a real directory (not a symlink) owned by us with no
+        group/other permissions.
+        """
+        import tempfile
+
+        base = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+        directory = Path(base) / f"llmi-term-{os.getuid()}"
+        try:
+            directory.mkdir(mode=0o700, exist_ok=True)
+            st = directory.lstat()
+        except OSError:
+            return None
+        if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+            return None
+        return directory
+
+    @staticmethod
+    def _cache_key(lines: int) -> str:
+        """Snapshot file name keyed by the current terminal/pane."""
+        import hashlib
+
+        key = "|".join([
+            os.environ.get('TMUX_PANE', ''),
+            os.environ.get('TERM_PROGRAM', ''),
+            os.environ.get('TERM_SESSION_ID', ''),
+            str(lines),
+        ])
+        return f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.txt"
+
+    @staticmethod
+    def _read_snapshot(directory: Path, name: str):
+        """Returns a snapshot younger than CACHE_TTL, or None."""
+        try:
+            fd = os.open(directory / name, os.O_RDONLY | os.O_NOFOLLOW)
+        except OSError:
+            return None
+        with os.fdopen(fd, 'r', encoding='utf-8') as f:
+            st = os.fstat(fd)
+            if not stat.S_ISREG(st.st_mode) or time.time() - st.st_mtime >= TerminalReader.CACHE_TTL:
+                return None
+            return f.read()
+
+    @staticmethod
+    def _remove_stale_snapshots(directory):
+        """Deletes expired snapshots and any left in ~/.cache by older versions."""
+        # Snapshots are no longer written to ~/.cache, so everything there is stale
+        now = time.time()
+        targets = [(CACHE_DIR / "term", 0)]
+        if directory is not None:
+            targets.append((directory, TerminalReader.CACHE_TTL))
+        for target, ttl in targets:
+            try:
+                with os.scandir(target) as it:
+                    for entry in it:
+                        if not entry.name.endswith('.txt'):
+                            continue
+                        try:
+                            if now - entry.stat(follow_symlinks=False).st_mtime >= ttl:
+                                os.unlink(entry.path)
+                        except OSError:
+                            pass
+            except OSError:
+                pass
+
+    @staticmethod
+    def _write_snapshot(directory: Path, name: str, content: str):
+        """Writes a snapshot readable only by the current user."""
+        fd = os.open(directory / name, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+
     @staticmethod
     def get_content(lines: int = 100) -> str:
         """
         Attempts to read the content of the current terminal window.
         Supports: macOS (Apple Terminal, iTerm2).
+        A snapshot taken within CACHE_TTL seconds in the same terminal is reused;
+        older snapshots are deleted.
         """
+        lines = min(lines, TerminalReader.MAX_LINES)
+        name = TerminalReader._cache_key(lines)
+        directory = TerminalReader._snapshot_dir()
+        if directory is not None:
+            try:
+                content = TerminalReader._read_snapshot(directory, name)
+            except (OSError, UnicodeDecodeError):
+                content = None
+            if content is not None:
+                return content
+
+        TerminalReader._remove_stale_snapshots(directory)
+        content = TerminalReader._read(lines)
+        if content and directory is not None:
+            try:
+                TerminalReader._write_snapshot(directory, name, content)
+            except OSError:
+                pass
+        return content
+
+    @staticmethod
+    def _compiled_script(script: str) -> list:
+        """
+        Returns the osascript argv for a script, compiling it to a .scpt once
+        so later runs skip AppleScript parsing. Falls back to `-e` on failure.
+        """
+        import hashlib
+
+        scpt = CACHE_DIR / "term" / f"{hashlib.sha1(script.encode('utf-8')).hexdigest()}.scpt"
+        if not scpt.exists():
+            try:
+                scpt.parent.mkdir(parents=True, exist_ok=True)
+                returncode, _, _ = _spawn_capture(['osacompile', '-o', str(scpt), '-e', script])
+                if returncode != 0:
+                    return ['osascript', '-e', script]
+            except Exception:
+                return ['osascript', '-e', script]
+        return ['osascript', str(scpt)]
+
+    @staticmethod
+    def _read(lines: int) -> str:
+        """Reads the terminal without going through the snapshot cache."""
         # 1. Try tmux (Cross-platform)
         if os.environ.get('TMUX'):
             try:
                 # Capture last N lines (-S -N)
-                result = subprocess.run(
-                    ['tmux', 'capture-pane', '-p', '-S', f'-{lines}'],
-                    capture_output=True, text=True
+                returncode, stdout, _ = _spawn_capture(
+                    ['tmux', 'capture-pane', '-p', '-J', '-S', f'-{lines}']
                 )
-                if result.returncode == 0:
-                    return result.stdout.strip()
+                if returncode == 0:
+                    return stdout.decode('utf-8', 'replace').strip()
             except Exception:
                 pass
 
@@ -101,27 +349,28 @@ class TerminalReader:
         
         script = None
         if term_program == 'Apple_Terminal':
-            script = f'''
+            script = TerminalReader._TAIL_HANDLER + f'''
             tell application "Terminal"
                 if not (exists window 1) then return ""
                 try
                     -- Try newer/cleaner syntax first for history
                     set termHistory to history of selected tab of front window
-                    return termHistory
                 on error
                     -- Fallback to contents if history fails (some older versions)
-                    return contents of selected tab of front window
+                    set termHistory to contents of selected tab of front window
                 end try
             end tell
+            return my tailText(termHistory, {lines})
             '''
         elif term_program == 'iTerm.app':
-            script = f'''
+            script = TerminalReader._TAIL_HANDLER + f'''
             tell application "iTerm"
                 if not (exists window 1) then return ""
                 tell current session of current window
-                    get contents
+                    set termHistory to contents
                 end tell
             end tell
+            return my tailText(termHistory, {lines})
             '''
         
         if not script:
@@ -130,72 +379,109 @@ class TerminalReader:
             
         try:
             # Run AppleScript
-            result = subprocess.run(['osascript', '-e', script], capture_output=True, text=True)
-            if result.returncode != 0:
+            returncode, stdout, stderr = _spawn_capture(TerminalReader._compiled_script(script))
+            if returncode != 0:
                 # Debug info only if failed
-                sys.stderr.write(f"⚠️ AppleScript Error: {result.stderr.strip()}\n")
+                sys.stderr.write(f"⚠️ AppleScript Error: {stderr.decode('utf-8', 'replace').strip()}\n")
                 return None
             
-            content = result.stdout.strip()
+            # The script already returns only the last N lines
+            content = stdout.decode('utf-8', 'replace').strip()
             # If content is empty but success, it might be weird
-            if not content:
-                return None
-                
-            # Get last N lines
-            content_lines = content.splitlines()
-            if len(content_lines) > lines:
-                content_lines = content_lines[-lines:]
-            
-            return "\n".join(content_lines)
+            return content or None
         except Exception as e:
             sys.stderr.write(f"⚠️ Terminal Reader Error: {e}\n")
             return None
 
 
+def _looks_binary(data) -> bool:
+    """嗅探前4KiB，含NUL字节即视为二进制，省去一次注定失败的UTF-8解码"""
+    return b'\x00' in data[:4096]
+
+
+def _decode_file_data(data) -> dict:
+    """
+    将文件字节解码为文本
+    非UTF-8内容视为二进制，只保留摘要（SHA-256和前512字节的十六进制），不做base64编码
+    """
+    if not _looks_binary(data):
+        try:
+            return {"content": str(data, 'utf-8'), "is_binary": False}
+        except UnicodeDecodeError:
+            pass
+
+    import hashlib
+    return {
+        "content": bytes(data[:512]).hex(),
+        "is_binary": True,
+        "sha256": hashlib.sha256(data).hexdigest()
+    }
+
+
+def _encode_file_data(data) -> dict:
+    """将文件字节解码为文本，非UTF-8内容视为二进制并编码为base64（供技能使用）"""
+    if not _looks_binary(data):
+        try:
+            return {"content": str(data, 'utf-8'), "is_binary": False}
+        except UnicodeDecodeError:
+            pass
+
+    import base64
+    return {"content": base64.b64encode(data).decode('ascii'), "is_binary": True}
+
+
+def _load_file(file_path: str, decode) -> dict:
+    """
+    校验并读取文件，返回包含path/name/size及decode结果的字典，校验失败返回{"error": ...}
+    支持相对路径转换，decode接收文件字节并返回content/is_binary等字段
+    """
+    # 支持相对路径：join+normpath即可，避免resolve()逐级lstat
+    abs_path = os.path.normpath(os.path.join(os.getcwd(), os.path.expanduser(file_path)))
+    
+    # 一次stat同时得到存在性、类型和大小
+    try:
+        st = os.stat(abs_path)
+    except FileNotFoundError:
+        return {"error": f"文件不存在: {file_path}"}
+    
+    if not stat.S_ISREG(st.st_mode):
+        return {"error": f"路径不是文件: {file_path}"}
+    
+    # 检查文件大小，避免上传过大文件
+    file_size = st.st_size
+    if file_size > 10 * 1024 * 1024:  # 10MB limit
+        return {"error": f"文件过大，超过10MB限制: {file_path}"}
+    
+    # 读取文件内容：只打开、读取一次，大文件用mmap直接从页缓存解码
+    with open(abs_path, 'rb') as f:
+        if file_size > 1024 * 1024:
+            import mmap
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                file_data = decode(data)
+        else:
+            file_data = decode(f.read())
+    
+    return {
+        "path": abs_path,
+        "name": os.path.basename(abs_path),
+        "size": file_size,
+        **file_data
+    }
+
+
 def read_file_content(file_path: str) -> dict:
     """
     读取文件内容，返回文件信息字典
     支持相对路径转换
     """
     try:
-        # 支持相对路径
-        abs_path = Path(file_path).expanduser().resolve()
-        
-        if not abs_path.exists():
-            return {"error": f"文件不存在: {file_path}"}
-        
-        if not abs_path.is_file():
-            return {"error": f"路径不是文件: {file_path}"}
-        
-        # 检查文件大小，避免上传过大文件
-        file_size = abs_path.stat().st_size
-        if file_size > 10 * 1024 * 1024:  # 10MB limit
-            return {"error": f"文件过大，超过10MB限制: {file_path}"}
-        
-        # 读取文件内容
-        try:
-            with open(abs_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            is_binary = False
-        except (UnicodeDecodeError, Exception):
-            # 如果是二进制文件，读取为base64
-            import base64
-            with open(abs_path, 'rb') as f:
-                binary_content = f.read()
-            content = base64.b64encode(binary_content).decode('utf-8')
-            is_binary = True
-        
-        return {
-            "success": True,
-            "path": str(abs_path),
-            "filename": abs_path.name,
-            "content": content,
-            "size": file_size,
-            "is_binary": is_binary
-        }
-        
+        file_info = _load_file(file_path, _decode_file_data)
     except Exception as e:
         return {"error": f"读取文件失败: {str(e)}"}
+    
+    if file_info.get('error'):
+        return file_info
+    return {"success": True, "filename": file_info['name'], **file_info}
 
 
 def get_shell_info():
@@ -208,44 +494,46 @@ def get_shell_info():
     }
 
 
-def create_structured_prompt(user_input: str, shell_info: dict, file_info: dict = None, terminal_context: str = None) -> list:
+def _file_content_preview(file_info: dict) -> str:
     """
-    创建结构化的提示信息
-    要求LLM以特定格式返回可直接使用的命令
+    生成放入提示中的文件内容
+    文本超过LLMI_MAX_FILE_CHARS（默认32768字符）时截断，二进制只给出摘要
     """
-    
-    # 构建系统提示
-    system_prompt = f"""你是一个命令行助手。用户在命令行环境中与你对话，不要发散性的考虑问题，简单直白的回答，不说废话。
+    if file_info['is_binary']:
+        return f"[二进制内容] SHA-256: {file_info['sha256']}\n前512字节(hex): {file_info['content']}"
+
+    max_chars = int(os.environ.get('LLMI_MAX_FILE_CHARS', 32 * 1024))
+    content = file_info['content']
+    if len(content) > max_chars:
+        return content[:max_chars] + "\n...[truncated]"
+    return content
+
+
+_SYSTEM_HEADER_TMPL = """你是一个命令行助手。用户在命令行环境中与你对话，不要发散性的考虑问题，简单直白的回答，不说废话。
 
 当前环境:
-- Shell: {shell_info['shell']}
-- 当前目录: {shell_info['current_directory']}"""
+- Shell: {shell}
+- 当前目录: {cwd}"""
 
-    # 如果有文件附件，添加文件信息
-    if file_info and file_info.get('success'):
-        file_info_text = f"""
+_FILE_TMPL = """
 
 文件附件信息:
-- 文件名: {file_info['filename']}
-- 文件路径: {file_info['path']}
-- 文件大小: {file_info['size']} bytes
-- 是否为二进制文件: {'是' if file_info['is_binary'] else '否'}
+- 文件名: {filename}
+- 文件路径: {path}
+- 文件大小: {size} bytes
+- 是否为二进制文件: {is_binary}
 - 文件内容: 
-{file_info['content'] if not file_info['is_binary'] else '[二进制内容，已编码为base64]'}"""
-        
-        system_prompt += file_info_text
-    
+{content}"""
 
-    if terminal_context:
-        system_prompt += f"""
+_TERM_TMPL = """
 
 Terminal Output Context (Last 100 lines):
 ----------------------------------------
-{terminal_context}
+{terminal}
 ----------------------------------------
 """
 
-    system_prompt += """
+_SYSTEM_FOOTER = """
 
 如果用户的问题是关于如何输入bash/zsh命令的，你必须以以下格式返回可以直接使用的命令:
 ```command
@@ -267,40 +555,196 @@ ls -l
 ```
 """
 
+
+def create_structured_prompt(user_input: str, shell_info: dict, file_info: dict = None, terminal_context: str = None) -> list:
+    """
+    创建结构化的提示信息
+    要求LLM以特定格式返回可直接使用的命令
+    """
+    
+    # 构建系统提示：静态部分为模块常量，各段一次性拼接，避免对大文件内容反复+=
+    parts = [_SYSTEM_HEADER_TMPL.format(
+        shell=shell_info['shell'],
+        cwd=shell_info['current_directory']
+    )]
+
+    # 如果有文件附件，添加文件信息
+    if file_info and file_info.get('success'):
+        parts.append(_FILE_TMPL.format(
+            filename=file_info['filename'],
+            path=file_info['path'],
+            size=file_info['size'],
+            is_binary='是' if file_info['is_binary'] else '否',
+            content=_file_content_preview(file_info)
+        ))
+
+    if terminal_context:
+        parts.append(_TERM_TMPL.format(terminal=terminal_context))
+
+    parts.append(_SYSTEM_FOOTER)
+
     messages = [
-        {"role": "system", "content": system_prompt},
+        {"role": "system", "content": ''.join(parts)},
         {"role": "user", "content": user_input}
     ]
 
     return messages
 
 
-def call_llm(messages: list) -> str:
-    """调用OpenAI兼容的API"""
+# 模型名称在启动时读取一次
+MODEL_NAME = os.environ.get('LLM_MODEL_NAME', 'doubao-seed-1.6-flash')
+
+
+@functools.lru_cache(maxsize=1)
+def _get_session():
+    """获取进程内共享的requests会话，复用keep-alive连接"""
+    # 延迟导入：只在真正需要网络时加载requests
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    # 连接失败及GET/HEAD遇到502/503/504时短暂退避重试；POST只在连接阶段失败时重试
+    retry = Retry(total=2, backoff_factor=0.3, status_forcelist=[502, 503, 504], raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=2, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _warm_up_connection():
+    """
+    预先建立到LLM_BASE_URL的连接（DNS+TCP+TLS），失败时忽略
+    直接走会话的连接池发HEAD，不经过会话的重试策略，进程退出时最多等待一次超时
+    """
     try:
-        client = OpenAI(
-            api_key=os.environ.get('LLM_API_KEY'),
-            base_url=os.environ.get('LLM_BASE_URL')
-        )
+        base_url = os.environ.get('LLM_BASE_URL')
+        if base_url:
+            from urllib3.util import parse_url
+            pool = _get_session().get_adapter(base_url).poolmanager.connection_from_url(base_url)
+            pool.urlopen('HEAD', parse_url(base_url).request_uri, retries=False, timeout=5)
+    except Exception:
+        pass
 
-        # 构建API参数
-        api_params = {
-            "model": os.environ.get('LLM_MODEL_NAME', 'doubao-seed-1.6-flash'),
-            "messages": messages,
-            "max_tokens": 1000,
-            "temperature": 0.3
-        }
 
-        # 如果有文件附件，直接在系统提示中包含文件内容（不使用image_url格式）
-        # 我们已经在create_structured_prompt中处理了文件内容
-        # 这里不再需要特殊处理
+class LLMError(RuntimeError):
+    """调用LLM失败"""
 
-        response = client.chat.completions.create(**api_params)
 
-        return response.choices[0].message.content
+def stream_llm(messages: list):
+    """
+    调用OpenAI兼容的API，逐段产出回答文本，失败时抛出LLMError
+    直接POST到/chat/completions并解析SSE流，不依赖openai SDK
+    """
+    import requests
+
+    url = os.environ.get('LLM_BASE_URL', '').rstrip('/') + '/chat/completions'
+    headers = {"Authorization": f"Bearer {os.environ.get('LLM_API_KEY')}"}
+
+    # 构建API参数
+    payload = {
+        "model": MODEL_NAME,
+        "messages": messages,
+        "max_tokens": 1000,
+        "temperature": 0.3,
+        "stream": True
+    }
 
-    except Exception as e:
-        return f"Error calling LLM: {str(e)}"
+    try:
+        response = _get_session().post(url, json=payload, headers=headers, stream=True, timeout=(10, 600))
+    except requests.Timeout as e:
+        raise LLMError(f"请求超时: {e}") from e
+    except requests.RequestException as e:
+        raise LLMError(f"调用LLM失败: {e}") from e
+
+    # 生成器提前关闭（如Ctrl-C）时同样会执行finally，及时断开连接停止生成
+    try:
+        if response.status_code == 429:
+            raise LLMError(f"请求过于频繁，已被限流: HTTP 429 {response.text[:500]}")
+        if response.status_code >= 400:
+            raise LLMError(f"调用LLM失败: HTTP {response.status_code} {response.text[:500]}")
+
+        for line in response.iter_lines():
+            if not line.startswith(b'data:'):
+                continue
+            data = line[5:].strip()
+            if data == b'[DONE]':
+                break
+            chunk = _json_loads(data)
+            if chunk.get('error'):
+                raise LLMError(f"调用LLM失败: {chunk['error']}")
+            choices = chunk.get('choices')
+            if not choices:
+                continue
+            delta = (choices[0].get('delta') or {}).get('content') or ""
+            if delta:
+                yield delta
+    except (requests.RequestException, ValueError) as e:
+        raise LLMError(f"调用LLM失败: {e}") from e
+    finally:
+        response.close()
+
+
+def call_llm(messages: list) -> str:
+    """
+    流式调用LLM：收到一段就打印一段，最后返回拼接后的完整回答供命令提取
+    失败时抛出LLMError
+    """
+    parts = []
+    try:
+        tokens = stream_llm(messages)
+        # 首段到达前不打印标题，以免请求失败时留下空的回答区
+        for delta in tokens:
+            if not parts:
+                print("\n💡 LLM回答:")
+            parts.append(delta)
+            sys.stdout.write(delta)
+            sys.stdout.flush()
+        if not parts:
+            print("\n💡 LLM回答:")
+        print("\n")
+    except KeyboardInterrupt:
+        print("\n⚠️ 已中断")
+        sys.exit(130)
+
+    return "".join(parts)
+
+
+def _prompt_cache_file(messages: list) -> Path:
+    """根据模型和完整消息列表计算缓存文件路径"""
+    import hashlib
+
+    payload = json.dumps({"model": MODEL_NAME, "messages": messages}, sort_keys=True, ensure_ascii=False)
+    key = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    return CACHE_DIR / "prompts" / f"{key}.json"
+
+
+def load_cached_response(messages: list) -> str:
+    """读取缓存的LLM回答，未命中或已过期（LLMI_CACHE_TTL秒，默认1天）返回None"""
+    cache_file = _prompt_cache_file(messages)
+    try:
+        ttl = float(os.environ.get('LLMI_CACHE_TTL', 86400))
+        if time.time() - cache_file.stat().st_mtime > ttl:
+            return None
+        with open(cache_file, 'rb') as f:
+            return _json_loads(f.read())['response']
+    except Exception:
+        return None
+
+
+def save_cached_response(messages: list, response: str):
+    """缓存LLM回答"""
+    cache_file = _prompt_cache_file(messages)
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(cache_file, 'wb') as f:
+            f.write(_json_dumps({"response": response}))
+    except Exception:
+        pass
+
+
+# 匹配```command代码块
+_COMMAND_RE = re.compile(r'```command\s*\n(.*?)\n```', re.DOTALL)
 
 
 def extract_command(llm_response: str) -> str:
@@ -308,11 +752,19 @@ def extract_command(llm_response: str) -> str:
     从LLM响应中提取命令
     如果找到```command代码块，返回其中的命令内容
     """
-    import re
-
-    # 匹配```command代码块
-    pattern = r'```command\s*\n(.*?)\n```'
-    match = re.search(pattern, llm_response, re.DOTALL)
+    # 快速路径：围栏是固定字面量，直接用str.find定位
+    start = llm_response.find('```command')
+    if start < 0:
+        return None
+    start += len('```command')
+    newline = llm_response.find('\n', start)
+    if newline >= 0 and not llm_response[start:newline].strip():
+        end = llm_response.find('\n```', newline + 1)
+        if end >= 0:
+            return llm_response[newline + 1:end].strip()
+
+    # 回退到正则，处理非常规空白等情况
+    match = _COMMAND_RE.search(llm_response)
     if match:
         return match.group(1).strip()
     return None
@@ -320,7 +772,17 @@ def extract_command(llm_response: str) -> str:
 
 def get_skills_dir() -> Path:
     """获取用户技能目录"""
-    return Path.home() / ".llm-inline" / "skills"
+    return SKILLS_DIR
+
+
+@functools.lru_cache(maxsize=64)
+def _load_skill_cached(config_file: Path, mtime_ns: int) -> dict:
+    """按(配置文件, 修改时间)缓存解析结果，文件变化后自动失效"""
+    try:
+        with open(config_file, 'rb') as f:
+            return _json_loads(f.read())
+    except Exception:
+        return None
 
 
 def load_skill(skill_name: str) -> dict:
@@ -329,36 +791,96 @@ def load_skill(skill_name: str) -> dict:
     skill_dir = skills_dir / skill_name
     config_file = skill_dir / "skill.json"
     
-    if not config_file.exists():
-        return None
-    
     try:
-        with open(config_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception:
+        mtime_ns = config_file.stat().st_mtime_ns
+    except OSError:
         return None
+    
+    return _load_skill_cached(config_file, mtime_ns)
+
+
+@functools.lru_cache(maxsize=4)
+def _list_skill_names(skills_dir: Path, mtime_ns: int) -> tuple:
+    """按(技能目录, 修改时间)缓存子目录列表；scandir自带d_type，普通目录无需逐项stat"""
+    with os.scandir(skills_dir) as it:
+        return tuple(entry.name for entry in it if entry.is_dir())
 
 
 def list_skills() -> list:
     """列出所有已安装的技能"""
     skills_dir = get_skills_dir()
-    if not skills_dir.exists():
+    try:
+        mtime_ns = skills_dir.stat().st_mtime_ns
+    except OSError:
         return []
     
     skills = []
-    for skill_dir in skills_dir.iterdir():
-        if skill_dir.is_dir():
-            config = load_skill(skill_dir.name)
-            if config:
-                skills.append(config)
+    for skill_name in _list_skill_names(skills_dir, mtime_ns):
+        config = load_skill(skill_name)
+        if config:
+            skills.append(config)
     return skills
 
 
+def _http_validators_file(url: str) -> Path:
+    """URL对应的HTTP校验信息（ETag/Last-Modified）缓存文件"""
+    import hashlib
+    return CACHE_DIR / "http" / f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}.json"
+
+
+def _conditional_get(url: str):
+    """
+    带If-None-Match/If-Modified-Since的流式GET，仅当上次下载的本地文件仍存在时才发送校验头
+    返回 (response, cached_path)：304时response为None，cached_path为上次保存的本地文件
+    """
+    record = {}
+    try:
+        with open(_http_validators_file(url), 'rb') as f:
+            record = _json_loads(f.read())
+        if not os.path.exists(record.get('path', '')):
+            record = {}
+    except (OSError, ValueError):
+        pass
+
+    headers = {'User-Agent': 'llmi/1.0'}
+    if record.get('etag'):
+        headers['If-None-Match'] = record['etag']
+    if record.get('last_modified'):
+        headers['If-Modified-Since'] = record['last_modified']
+
+    response = _get_session().get(url, headers=headers, stream=True, timeout=(3.05, 27))
+    if response.status_code == 304 and record:
+        response.close()
+        return None, record['path']
+    response.raise_for_status()
+    return response, None
+
+
+def _remember_validators(url: str, response, local_path: Path):
+    """记录响应的ETag/Last-Modified，供下次条件请求使用，失败时忽略"""
+    record = {
+        "etag": response.headers.get('ETag'),
+        "last_modified": response.headers.get('Last-Modified'),
+        "path": str(local_path)
+    }
+    if not (record["etag"] or record["last_modified"]):
+        return
+    try:
+        validators_file = _http_validators_file(url)
+        validators_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(validators_file, 'wb') as f:
+            f.write(_json_dumps(record))
+    except OSError:
+        pass
+
+
 def install_skill_from_url(url: str) -> bool:
-    """从URL安装技能"""
+    """从URL安装技能，服务端返回304时跳过未变化文件的下载与写盘"""
     try:
         print(f"📥 正在下载技能配置: {url}")
         
+        response = None
+        config_unchanged = False
         # 处理file://协议
         if url.startswith('file://'):
             file_path = url[7:]  # 移除file://
@@ -366,17 +888,21 @@ def install_skill_from_url(url: str) -> bool:
                 print(f"❌ 文件不存在: {file_path}")
                 return False
             
-            with open(file_path, 'r', encoding='utf-8') as f:
+            with open(file_path, 'rb') as f:
                 content = f.read()
         else:
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            content = response.text
+            response, cached_path = _conditional_get(url)
+            if response is None:
+                config_unchanged = True
+                with open(cached_path, 'rb') as f:
+                    content = f.read()
+            else:
+                content = response.content
         
         # 尝试解析JSON
         try:
-            config = json.loads(content)
-        except json.JSONDecodeError:
+            config = _json_loads(content)
+        except ValueError:
             print("❌ 下载的文件不是有效的JSON格式")
             return False
         
@@ -387,19 +913,10 @@ def install_skill_from_url(url: str) -> bool:
                 print(f"❌ 技能配置缺少必要字段: {field}")
                 return False
         
-        skill_name = config['name']
-        skills_dir = get_skills_dir()
-        skill_dir = skills_dir / skill_name
-        skill_dir.mkdir(parents=True, exist_ok=True)
-        
-        # 保存配置文件
-        config_file = skill_dir / "skill.json"
-        with open(config_file, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
-        
-        # 下载处理脚本（如果有）
+        # 构建handler URL
+        handler_url = None
+        handler_future = None
         if 'handler' in config:
-            # 构建handler URL
             if url.startswith('file://'):
                 # 对于file://，使用配置文件的目录
                 base_path = os.path.dirname(url[7:])
@@ -408,10 +925,34 @@ def install_skill_from_url(url: str) -> bool:
             else:
                 # 对于HTTP(S) URLs，正常拼接
                 handler_url = url.rsplit('/', 1)[0] + '/' + config['handler']
-                
+            
+            print(f"📥 正在下载处理脚本: {handler_url}")
+            
+            # 处理脚本的下载与下面的配置写盘互不依赖，提前在后台发起
+            if not handler_url.startswith('file://'):
+                from concurrent.futures import ThreadPoolExecutor
+                pool = ThreadPoolExecutor(max_workers=1)
+                handler_future = pool.submit(_conditional_get, handler_url)
+                pool.shutdown(wait=False)
+        
+        skill_name = config['name']
+        skills_dir = get_skills_dir()
+        skill_dir = skills_dir / skill_name
+        skill_dir.mkdir(parents=True, exist_ok=True)
+        
+        # 保存配置文件（未变化时跳过）
+        config_file = skill_dir / "skill.json"
+        if not config_unchanged:
+            with open(config_file, 'wb') as f:
+                f.write(_json_dumps(config, indent=True))
+            if response is not None:
+                _remember_validators(url, response, config_file)
+        
+        # 下载处理脚本（如果有）
+        handler_unchanged = True
+        if handler_url:
             try:
-                print(f"📥 正在下载处理脚本: {handler_url}")
-                
+                handler_file = skill_dir / config['handler']
                 # 处理file://协议
                 if handler_url.startswith('file://'):
                     handler_file_path = handler_url[7:]  # 移除file://
@@ -419,24 +960,38 @@ def install_skill_from_url(url: str) -> bool:
                         print(f"❌ 处理脚本文件不存在: {handler_file_path}")
                         return False
                     
-                    with open(handler_file_path, 'r', encoding='utf-8') as f:
+                    with open(handler_file_path, 'rb') as f:
                         handler_content = f.read()
+                    with open(handler_file, 'wb') as f:
+                        f.write(handler_content)
+                    handler_unchanged = False
                 else:
-                    handler_response = requests.get(handler_url, timeout=30)
-                    handler_response.raise_for_status()
-                    handler_content = handler_response.text
-                
-                handler_file = skill_dir / config['handler']
-                with open(handler_file, 'w', encoding='utf-8') as f:
-                    f.write(handler_content)
+                    handler_response, _ = handler_future.result()
+                    if handler_response is not None:
+                        # 流式写入临时文件后原子替换，不在内存中拼出整个脚本
+                        tmp_file = handler_file.with_name(handler_file.name + ".tmp")
+                        with handler_response, open(tmp_file, 'wb') as f:
+                            for chunk in handler_response.iter_content(chunk_size=65536):
+                                f.write(chunk)
+                        os.replace(tmp_file, handler_file)
+                        _remember_validators(handler_url, handler_response, handler_file)
+                        handler_unchanged = False
                 
                 # 使脚本可执行
                 os.chmod(handler_file, 0o755)
                 
+                # 安装时预编译字节码，首次执行技能时无需再解析源码
+                if not handler_unchanged and handler_file.suffix == '.py':
+                    import py_compile
+                    py_compile.compile(str(handler_file), doraise=False, quiet=1)
+                
             except Exception as e:
                 print(f"⚠️ 下载处理脚本失败: {e}")
         
-        print(f"✅ 技能 '{skill_name}' 安装成功!")
+        if config_unchanged and handler_unchanged:
+            print(f"✅ 技能 '{skill_name}' 已是最新版本")
+        else:
+            print(f"✅ 技能 '{skill_name}' 安装成功!")
         return True
         
     except Exception as e:
@@ -444,9 +999,34 @@ def install_skill_from_url(url: str) -> bool:
         return False
 
 
-def execute_skill(skill_name: str, args: list) -> bool:
-    """执行技能"""
-    config = load_skill(skill_name)
+# 已加载的技能模块，按(脚本路径, 修改时间)缓存
+_SKILL_MODULES = {}
+
+
+def _load_skill_module(skill_name: str, handler_file: Path):
+    """
+    按文件路径加载技能脚本，不修改sys.path，也不写入sys.modules
+    模块名带llmi_skill_前缀，避免与同名的标准库/第三方模块冲突
+    同一进程内重复调用直接复用，脚本修改后自动重新加载；__pycache__中的字节码会被复用
+    """
+    import importlib.util
+
+    key = (str(handler_file), handler_file.stat().st_mtime_ns)
+    module = _SKILL_MODULES.get(key)
+    if module is None:
+        spec = importlib.util.spec_from_file_location(f"llmi_skill_{skill_name}", handler_file)
+        if spec is None or spec.loader is None:
+            raise ImportError(f"无法加载技能脚本: {handler_file}")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _SKILL_MODULES[key] = module
+    return module
+
+
+def execute_skill(skill_name: str, args: list, config: dict = None) -> bool:
+    """执行技能，已加载的配置可通过config传入以避免重复解析"""
+    if config is None:
+        config = load_skill(skill_name)
     if not config:
         print(f"❌ 技能 '{skill_name}' 不存在")
         return False
@@ -458,18 +1038,24 @@ def execute_skill(skill_name: str, args: list) -> bool:
         if 'handler' in config:
             handler_file = skill_dir / config['handler']
             if handler_file.exists():
+                # 技能通常会调用LLM：预处理参数的同时预热llmi_runtime的连接池
+                try:
+                    import llmi_runtime
+                    llmi_runtime.warm_up()
+                except ImportError:
+                    pass
+                
                 # 预处理文件参数
                 processed_args = preprocess_skill_args(config, args)
                 
                 # 动态导入并执行Python脚本
-                sys.path.insert(0, str(skill_dir))
                 try:
-                    module_name = config['handler'].replace('.py', '')
-                    module = __import__(module_name)
-                    
-                    # 注入LLM运行时环境
-                    import llmi_runtime
-                    
+                    module = _load_skill_module(skill_name, handler_file)
+                except Exception as e:
+                    print(f"❌ 导入技能脚本失败: {e}")
+                    return False
+                
+                try:
                     # 调用main函数
                     if hasattr(module, 'main'):
                         result = module.main(processed_args)
@@ -478,16 +1064,9 @@ def execute_skill(skill_name: str, args: list) -> bool:
                         print(f"❌ 技能脚本缺少main函数")
                         return False
                         
-                except ImportError as e:
-                    print(f"❌ 导入技能脚本失败: {e}")
-                    return False
                 except Exception as e:
                     print(f"❌ 执行技能脚本失败: {e}")
                     return False
-                finally:
-                    # 清理sys.path
-                    if str(skill_dir) in sys.path:
-                        sys.path.remove(str(skill_dir))
             else:
                 print(f"❌ 技能处理脚本不存在: {config['handler']}")
                 return False
@@ -511,10 +1090,6 @@ def execute_skill(skill_name: str, args: list) -> bool:
 
 def preprocess_skill_args(config: dict, args: list) -> list:
     """预处理技能参数，处理文件参数"""
-    import os
-    import base64
-    from pathlib import Path
-    
     # 检查技能是否有文件参数
     if not 'parameters' in config:
         return args
@@ -542,53 +1117,20 @@ def preprocess_skill_args(config: dict, args: list) -> list:
         # 如果找到文件路径，预处理文件内容
         if file_value:
             try:
-                # 支持相对路径
-                abs_path = Path(file_value).expanduser().resolve()
-                
-                if not abs_path.exists():
-                    print(f"❌ 文件不存在: {file_value}")
-                    return args
-                
-                if not abs_path.is_file():
-                    print(f"❌ 路径不是文件: {file_value}")
-                    return args
-                
-                # 检查文件大小，避免上传过大文件
-                file_size = abs_path.stat().st_size
-                if file_size > 10 * 1024 * 1024:  # 10MB limit
-                    print(f"❌ 文件过大，超过10MB限制: {file_value}")
-                    return args
-                
-                # 读取文件内容
-                try:
-                    with open(abs_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    is_binary = False
-                except (UnicodeDecodeError, Exception):
-                    # 如果是二进制文件，读取为base64
-                    with open(abs_path, 'rb') as f:
-                        binary_content = f.read()
-                    content = base64.b64encode(binary_content).decode('utf-8')
-                    is_binary = True
-                
-                # 构建文件信息字典
-                file_info = {
-                    'path': str(abs_path),
-                    'name': abs_path.name,
-                    'size': file_size,
-                    'content': content,
-                    'is_binary': is_binary
-                }
-                
-                # 将文件路径替换为文件信息字典
-                # 使用特殊标记，让技能知道这是预处理的文件内容
-                processed_args[file_index] = file_info
-                
-                print(f"📎 已预处理文件: {abs_path.name} ({file_size/1024:.1f}KB)")
-                
+                file_info = _load_file(file_value, _encode_file_data)
             except Exception as e:
                 print(f"❌ 预处理文件失败: {e}")
                 return args
+            
+            if file_info.get('error'):
+                print(f"❌ {file_info['error']}")
+                return args
+            
+            # 将文件路径替换为文件信息字典
+            # 使用特殊标记，让技能知道这是预处理的文件内容
+            processed_args[file_index] = file_info
+            
+            print(f"📎 已预处理文件: {file_info['name']} ({file_info['size']/1024:.1f}KB)")
     
     return processed_args
 
@@ -603,6 +1145,25 @@ def ensure_llm_env() -> None:
         sys.exit(2)
 
 
+_CACHE_DIR_READY = False
+
+
+def write_last_command(command: str):
+    """
+    原子地写入最近一次建议的命令
+    先写临时文件再os.replace，shell按键绑定不会读到写了一半的文件
+    """
+    global _CACHE_DIR_READY
+    if not _CACHE_DIR_READY:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        _CACHE_DIR_READY = True
+
+    tmp_file = LAST_COMMAND_FILE.with_name(f"last_command.{os.getpid()}.tmp")
+    with open(tmp_file, 'wb') as f:
+        f.write(command.encode('utf-8') + b"\n")
+    os.replace(tmp_file, LAST_COMMAND_FILE)
+
+
 def show_help():
     """显示帮助信息"""
     help_text = """
@@ -611,6 +1172,7 @@ llm-inline - OpenAI-compatible command line LLM interface
 Usage:
   llmi "question" [--file path]      # 直接询问
   llmi ask "question" [--file path]  # 兼容模式
+  llmi ask --stdin [--file path]     # 批量模式，每行一个问题
   llmi install <url>               # 安装技能
   llmi list                         # 列出技能
 
@@ -653,6 +1215,135 @@ Skills:
 
 
 
+# 批量回答中每条回答的编号前缀，如 "#2: ..."
+_BATCH_ANSWER_RE = re.compile(r'^#(\d+):[ \t]*', re.MULTILINE)
+
+
+def split_batch_answers(llm_response: str, count: int) -> list:
+    """按 #N: 编号将批量回答拆分为count条，缺失的编号返回空字符串"""
+    answers = [""] * count
+    matches = list(_BATCH_ANSWER_RE.finditer(llm_response))
+    for i, match in enumerate(matches):
+        index = int(match.group(1)) - 1
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(llm_response)
+        if 0 <= index < count:
+            answers[index] = llm_response[match.end():end].strip()
+    return answers
+
+
+def run_batch(questions: list, file_path: str = None) -> list:
+    """
+    将多个问题合并为一次LLM请求
+    文件附件只在系统提示中出现一次，由所有问题共享
+    返回按问题顺序排列的回答列表
+    """
+    print(f"🤔 批量提问: {len(questions)} 个问题")
+
+    file_info = None
+    if file_path:
+        file_info = read_file_content(file_path)
+        if file_info.get('error'):
+            print(f"❌ {file_info['error']}")
+            sys.exit(1)
+        print(f"📎 附件文件: {file_info['filename']} ({file_info['size']} bytes)")
+    print()
+
+    user_input = "\n".join(f"#{i}: {q}" for i, q in enumerate(questions, 1))
+    messages = create_structured_prompt(user_input, get_shell_info(), file_info)
+    messages[0]["content"] += f"""
+用户一次提出了{len(questions)}个编号问题。请逐条回答，每条回答另起一行并以对应编号开头，格式为 "#编号: 回答"，不要合并或遗漏。
+"""
+
+    ensure_llm_env()
+
+    print("🧠 正在思考...")
+    try:
+        llm_response = call_llm(messages)
+    except LLMError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    answers = split_batch_answers(llm_response, len(questions))
+    commands = [(i, extract_command(a)) for i, a in enumerate(answers, 1)]
+    commands = [(i, c) for i, c in commands if c]
+    if commands:
+        print("=" * 50)
+        print("📋 建议命令:")
+        for i, command in commands:
+            print(f"#{i}: {command}")
+
+    return answers
+
+
+# --- 终端读取触发词 ---
+
+TRIGGER_KEYWORDS = {
+    # 核心关键词
+    'error': ['报错', '错误', 'error', 'exception', 'fail', 'failed'],
+    'target': ['output', '输出', 'log', '日志', 'content', '内容'],
+    # 方位/时间关键词
+    'position': ['上面', 'above', 'prev', '之前', '刚才', '刚刚', 'last', 'recent', 'up', 'previous', '这个'],
+    # 动作关键词
+    'action': ['分析', 'analyze', 'check', '看', '解释', 'explain', 'fix', 'solve', '解决', '什么意思', 'mean'],
+    # 特定的强触发短语
+    'phrase': ['read terminal', '读取终端', 'output above'],
+}
+
+# 关键词 -> 类别集合；同时并入其前缀关键词的类别，
+# 这样在同一位置只报告最长匹配时也不会漏掉较短关键词的类别
+_KEYWORD_CATEGORIES = {}
+for _cat, _kws in TRIGGER_KEYWORDS.items():
+    for _kw in _kws:
+        _KEYWORD_CATEGORIES.setdefault(_kw.lower(), set()).add(_cat)
+_KEYWORD_CATEGORIES = {
+    kw: frozenset().union(*(cats for k, cats in _KEYWORD_CATEGORIES.items() if kw.startswith(k)))
+    for kw in _KEYWORD_CATEGORIES
+}
+
+try:
+    import ahocorasick
+
+    _TRIGGER_AUTOMATON = ahocorasick.Automaton()
+    for _kw, _cats in _KEYWORD_CATEGORIES.items():
+        _TRIGGER_AUTOMATON.add_word(_kw, _cats)
+    _TRIGGER_AUTOMATON.make_automaton()
+
+    def match_trigger_categories(text: str) -> set:
+        """单次扫描，返回文本命中的所有触发词类别"""
+        return set().union(*(cats for _, cats in _TRIGGER_AUTOMATON.iter(text.lower())))
+except ImportError:
+    # 零宽前瞻让每个位置都报告一次匹配，长词优先
+    _TRIGGER_RE = re.compile('(?=(%s))' % '|'.join(
+        map(re.escape, sorted(_KEYWORD_CATEGORIES, key=len, reverse=True))))
+
+    def match_trigger_categories(text: str) -> set:
+        """单次扫描，返回文本命中的所有触发词类别"""
+        return set().union(*(_KEYWORD_CATEGORIES[kw] for kw in _TRIGGER_RE.findall(text.lower())))
+
+
+def parse_args(argv: list, allow_stdin: bool = False) -> tuple:
+    """
+    单次遍历参数，分离问题文本和--file/-f（或--file=路径）指定的文件
+    allow_stdin为True时识别批量模式开关--stdin
+    "--"之后的参数一律视为问题文本
+    返回 (user_input, file_path, use_stdin)
+    """
+    question, file_path, use_stdin = [], None, False
+    it = iter(argv)
+    for arg in it:
+        if arg == '--':
+            question.extend(it)
+        elif allow_stdin and arg == '--stdin':
+            use_stdin = True
+        elif arg in ('--file', '-f'):
+            file_path = next(it, None)
+        elif arg.startswith('--file='):
+            file_path = arg[len('--file='):]
+        else:
+            question.append(arg)
+    return " ".join(question).strip(), file_path, use_stdin
+
+
 def main():
     import sys
     
@@ -679,21 +1370,16 @@ def main():
             print("Usage: llmi ask \"your question here\" [--file file_path]")
             sys.exit(1)
         
-        # 将剩余参数合并为问题
-        user_input = " ".join(args[1:]).strip()
-        
-        file_path = None
-        # 检查是否有--file参数
-        if '--file' in args or '-f' in args:
-            try:
-                file_index = args.index('--file') if '--file' in args else args.index('-f')
-                if file_index + 1 < len(args):
-                    file_path = args[file_index + 1]
-                    # 从user_input中移除--file和file_path
-                    file_part = f"--file {file_path}" if '--file' in args else f"-f {file_path}"
-                    user_input = user_input.replace(file_part, "").strip()
-            except ValueError:
-                pass
+        user_input, file_path, use_stdin = parse_args(args[1:], allow_stdin=True)
+
+        # 批量模式：从标准输入逐行读取问题，合并为一次请求
+        if use_stdin:
+            questions = [line.strip() for line in sys.stdin if line.strip()]
+            if not questions:
+                print("❌ 标准输入中没有问题")
+                sys.exit(1)
+            run_batch(questions, file_path)
+            sys.exit(0)
     elif first_arg == 'install':
         # 安装技能
         if len(args) < 2:
@@ -731,72 +1417,32 @@ def main():
             print("⚠️ 未找到会话ID")
         sys.exit(0)
 
-    elif load_skill(first_arg):
+    elif (skill_config := load_skill(first_arg)):
         # 执行已安装的技能
         skill_name = first_arg
         skill_args = args[1:] if len(args) > 1 else []
 
-        success = execute_skill(skill_name, skill_args)
+        success = execute_skill(skill_name, skill_args, skill_config)
         sys.exit(0 if success else 1)
             
     else:
         # 默认行为：将所有参数作为问题处理
-        user_input = " ".join(args).strip()
-        file_path = None
-        
-        # 检查是否有--file参数
-        if '--file' in args or '-f' in args:
-            try:
-                file_index = args.index('--file') if '--file' in args else args.index('-f')
-                if file_index + 1 < len(args):
-                    file_path = args[file_index + 1]
-                    # 从user_input中移除--file和file_path
-                    file_part = f"--file {file_path}" if '--file' in args else f"-f {file_path}"
-                    user_input = user_input.replace(file_part, "").strip()
-            except ValueError:
-                pass
+        user_input, file_path, _ = parse_args(args)
     
     print(f"🤔 用户提问: {user_input}")
     if file_path:
         print(f"📎 附件文件: {file_path}")
     print()
 
-    # 获取shell信息
-    shell_info = get_shell_info()
-    
-    # Context Management
-    session_id = os.environ.get('LLMI_SESSION_ID')
-    history = []
-    ctx_mgr = None
-    
-    if session_id:
-        ctx_mgr = ContextManager(session_id)
-        history = ctx_mgr.load_history()
-        if history:
-            print(f"📜 已加载上下文 ({len(history)} 条消息)")
-    
-    # Terminal Content Reading Logic
-    terminal_context = None
-    
     # 触发词逻辑优化
-    user_input_lower = user_input.lower()
     should_read_terminal = False
-    
-    # 核心关键词
-    error_keywords = ['报错', '错误', 'error', 'exception', 'fail', 'failed']
-    target_keywords = ['output', '输出', 'log', '日志', 'content', '内容']
-    
-    # 方位/时间关键词
-    position_keywords = ['上面', 'above', 'prev', '之前', '刚才', '刚刚', 'last', 'recent', 'up', 'previous', '这个']
-    
-    # 动作关键词
-    action_keywords = ['分析', 'analyze', 'check', '看', '解释', 'explain', 'fix', 'solve', '解决', '什么意思', 'mean']
 
     # 组合判断
-    has_error_kw = any(k in user_input_lower for k in error_keywords)
-    has_target_kw = any(k in user_input_lower for k in target_keywords)
-    has_pos_kw = any(k in user_input_lower for k in position_keywords)
-    has_action_kw = any(k in user_input_lower for k in action_keywords)
+    categories = match_trigger_categories(user_input)
+    has_error_kw = 'error' in categories
+    has_target_kw = 'target' in categories
+    has_pos_kw = 'position' in categories
+    has_action_kw = 'action' in categories
 
     # 规则 1: 明确的“分析报错”、“看报错”等
     # (关键词 "分析/看" + "报错/错误")
@@ -808,12 +1454,42 @@ def main():
         should_read_terminal = True
         
     # 规则 3: 特定的强触发短语
-    elif any(phrase in user_input_lower for phrase in ['read terminal', '读取终端', 'output above']):
+    elif 'phrase' in categories:
         should_read_terminal = True
 
-    if should_read_terminal:
+    # 终端读取、文件读取和LLM连接预热互不依赖，提前并发启动
+    # 预热放在守护线程：线程池的工作线程会在进程退出时被等待，出错提前退出也得等HEAD结束
+    # 启用提示缓存时可能根本不联网，因此只在必然请求LLM时预热
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    use_cache = os.environ.get('LLMI_CACHE') == '1'
+    if not use_cache:
+        threading.Thread(target=_warm_up_connection, daemon=True).start()
+    pool = ThreadPoolExecutor(max_workers=2)
+    term_future = pool.submit(TerminalReader.get_content) if should_read_terminal else None
+    file_future = pool.submit(read_file_content, file_path) if file_path else None
+    pool.shutdown(wait=False)
+
+    # 获取shell信息
+    shell_info = get_shell_info()
+    
+    # Context Management
+    session_id = os.environ.get('LLMI_SESSION_ID')
+    history = []
+    ctx_mgr = None
+    
+    if session_id:
+        ctx_mgr = ContextManager(session_id)
+        history = ctx_mgr.load_history()
+        if history:
+            print(f"📜 已加载上下文 ({len(history)} 条消息)")
+    
+    # Terminal Content Reading Logic
+    terminal_context = None
+
+    if term_future:
         print("👀 正在读取终端内容...")
-        content = TerminalReader.get_content()
+        content = term_future.result()
         if content:
             terminal_context = content
             print(f"✅ 已获取终端内容 ({len(content.splitlines())} 行)")
@@ -822,9 +1498,9 @@ def main():
 
     # 处理文件附件
     file_info = None
-    if file_path:
+    if file_future:
         print("📂 正在读取文件...")
-        file_info = read_file_content(file_path)
+        file_info = file_future.result()
         if file_info.get('error'):
             print(f"❌ {file_info['error']}")
             sys.exit(1)
@@ -845,26 +1521,33 @@ def main():
     # 确保环境
     ensure_llm_env()
 
-    # 调用LLM
-    print("🧠 正在思考...")
-    llm_response = call_llm(final_messages)
+    # 查询本地提示缓存（LLMI_CACHE=1 时启用）
+    llm_response = load_cached_response(final_messages) if use_cache else None
 
-    if llm_response.startswith("Error"):
-        print(f"{llm_response}")
-        sys.exit(1)
+    if llm_response is not None:
+        print("⚡ 命中缓存")
+        print("\n💡 LLM回答:")
+        print(llm_response)
+        print()
+    else:
+        # 调用LLM
+        print("🧠 正在思考...")
+        try:
+            llm_response = call_llm(final_messages)
+        except LLMError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+
+        if use_cache:
+            save_cached_response(final_messages, llm_response)
 
     # 提取命令
     command = extract_command(llm_response)
 
-    print("\n💡 LLM回答:")
-    print(llm_response)
-    print()
-
     # Save to history
     if ctx_mgr:
         # Append current interaction
-        new_history = history + [base_messages[1], {"role": "assistant", "content": llm_response}]
-        ctx_mgr.save_history(new_history)
+        ctx_mgr.append_messages([base_messages[1], {"role": "assistant", "content": llm_response}])
 
     # 如果有命令，提示用户可以使用
     if command:
@@ -875,9 +1558,7 @@ def main():
 
         # 将命令缓存到文件，供 shell 按键绑定读取
         try:
-            cache_dir = Path(os.path.expanduser("~/.cache/llmi"))
-            cache_dir.mkdir(parents=True, exist_ok=True)
-            (cache_dir / "last_command").write_text(command + "\n", encoding="utf-8")
+            write_last_command(command)
         except Exception as _:
             pass
 
@@ -5,7 +5,554 @@ llm-inline运行时API
 """
 
 import os
-from openai import OpenAI
+import functools
+import threading
+
+
+# 保护各全局单例的构建；可重入，因为构建运行时会顺带构建共享的httpx客户端
+_singleton_lock = threading.RLock()
+
+# 连接池参数：LLM和Vision运行时共用同一个保持TLS连接的池
+_HTTP_MAX_KEEPALIVE = 32
+_HTTP_MAX_CONNECTIONS = 64
+_HTTP_KEEPALIVE_EXPIRY = 60
+
+# 进程内共享的同步httpx客户端
+_http_client = None
+
+
+def _http_client_options() -> dict:
+    """httpx客户端的公共参数；安装了h2时启用HTTP/2"""
+    import httpx
+    
+    try:
+        import h2  # noqa: F401
+        http2 = True
+    except ImportError:
+        http2 = False
+    
+    return {
+        "http2": http2,
+        "limits": httpx.Limits(
+            max_keepalive_connections=_HTTP_MAX_KEEPALIVE,
+            max_connections=_HTTP_MAX_CONNECTIONS,
+            keepalive_expiry=_HTTP_KEEPALIVE_EXPIRY
+        ),
+        # 读超时沿用openai SDK的默认值，图像生成可能需要数分钟
+        "timeout": httpx.Timeout(600.0, connect=10.0)
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def _http_client_class(is_async: bool):
+    """httpx客户端类；安装了orjson时用它序列化JSON请求体，大段中文提示比标准库json快得多"""
+    import httpx
+    
+    base = httpx.AsyncClient if is_async else httpx.Client
+    try:
+        import orjson
+    except ImportError:
+        return base
+    
+    class OrjsonClient(base):
+        def build_request(self, *args, **kwargs):
+            body = kwargs.get("json")
+            # 上传文件时SDK同时传入files/data，需由httpx编码为multipart，不能改成JSON请求体
+            if body is not None and not kwargs.get("files") and not kwargs.get("data"):
+                try:
+                    content = orjson.dumps(body, option=orjson.OPT_NON_STR_KEYS)
+                except TypeError:
+                    # orjson不支持的类型交回httpx按标准库处理
+                    pass
+                else:
+                    del kwargs["json"]
+                    kwargs["content"] = content
+                    headers = httpx.Headers(kwargs.get("headers"))
+                    headers.setdefault("Content-Type", "application/json")
+                    kwargs["headers"] = headers
+            return super().build_request(*args, **kwargs)
+    
+    OrjsonClient.__name__ = OrjsonClient.__qualname__ = "Orjson" + base.__name__
+    return OrjsonClient
+
+
+def _get_http_client():
+    """获取进程内共享的同步httpx客户端，进程退出时关闭"""
+    global _http_client
+    if _http_client is None:
+        with _singleton_lock:
+            if _http_client is None:
+                import atexit
+                client = _http_client_class(False)(**_http_client_options())
+                atexit.register(client.close)
+                _http_client = client
+    return _http_client
+
+
+def warm_up():
+    """
+    在后台向LLM和Vision端点发HEAD，提前在共享连接池中完成DNS+TCP+TLS握手
+    llmi启动技能时调用，与参数预处理等本地工作重叠；守护线程不会拖住进程退出，失败时忽略
+    """
+    base_urls = {
+        (_env_list('LLM_BASE_URL_LIST') or [os.environ.get('LLM_BASE_URL')])[0],
+        os.environ.get('LLM_VISION_BASE_URL')
+    }
+    base_urls -= {None, ''}
+    
+    def run(base_url):
+        try:
+            _get_http_client().head(base_url, timeout=5)
+        except Exception:
+            pass
+    
+    for base_url in base_urls:
+        threading.Thread(target=run, args=(base_url,), daemon=True).start()
+
+
+def _new_async_http_client():
+    """创建异步httpx客户端；其连接绑定在事件循环上，因此不跨asyncio.run()共享"""
+    return _http_client_class(True)(**_http_client_options())
+
+
+# 限流/服务端错误的重试策略：最多尝试5次，指数退避（1s起，上限30s）加随机抖动
+_RETRY_ATTEMPTS = 5
+_RETRY_MAX_WAIT = 30.0
+
+
+def _is_retryable(error: Exception) -> bool:
+    """429、5xx、连接失败和超时可以重试"""
+    import openai
+    return isinstance(error, (
+        openai.RateLimitError,
+        openai.InternalServerError,
+        openai.APIConnectionError,
+    ))
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """优先使用服务端Retry-After头给出的等待秒数，否则指数退避加抖动"""
+    import random
+    
+    response = getattr(error, 'response', None)
+    if response is not None:
+        try:
+            return min(float(response.headers.get('retry-after')), _RETRY_MAX_WAIT)
+        except (TypeError, ValueError):
+            pass
+    return min(2 ** attempt + random.uniform(0, 1), _RETRY_MAX_WAIT)
+
+
+def _create_with_retry(client, params: dict):
+    """调用chat.completions.create，遇到可重试错误时退避后重试"""
+    import time
+    
+    for attempt in range(_RETRY_ATTEMPTS):
+        try:
+            return client.chat.completions.create(**params)
+        except Exception as e:
+            if attempt == _RETRY_ATTEMPTS - 1 or not _is_retryable(e):
+                raise
+            time.sleep(_retry_delay(e, attempt))
+
+
+async def _acreate_with_retry(aclient, params: dict):
+    """_create_with_retry的异步版本，等待期间不阻塞其他并发请求"""
+    import asyncio
+    
+    for attempt in range(_RETRY_ATTEMPTS):
+        try:
+            return await aclient.chat.completions.create(**params)
+        except Exception as e:
+            if attempt == _RETRY_ATTEMPTS - 1 or not _is_retryable(e):
+                raise
+            await asyncio.sleep(_retry_delay(e, attempt))
+
+
+class LLMCache:
+    """
+    LLM响应的精确匹配缓存
+    以请求参数的SHA-256为键；内存字典在前，$XDG_CACHE_HOME/llmi/cache.jsonl追加写入持久化
+    """
+    
+    # 内存中最多保留的条目数
+    MAX_ENTRIES = 1024
+    
+    def __init__(self, path=None, ttl: float = None):
+        from pathlib import Path
+        
+        if path is None:
+            cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+            path = os.path.join(cache_home, 'llmi', 'cache.jsonl')
+        self.path = Path(path)
+        # 与llmi的提示缓存共用LLMI_CACHE_TTL，默认1天
+        self.ttl = ttl if ttl is not None else float(os.environ.get('LLMI_CACHE_TTL', 86400))
+        self.stats = {"hits": 0, "misses": 0}
+        self._entries = None
+    
+    @staticmethod
+    def make_key(params: dict) -> str:
+        """根据完整请求参数（模型、消息、温度等）计算缓存键"""
+        import hashlib
+        import json
+        
+        payload = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def _load(self) -> dict:
+        """首次访问时读入未过期的条目；过期条目较多时顺带压缩文件"""
+        if self._entries is not None:
+            return self._entries
+        
+        import json
+        import time
+        
+        entries = {}
+        stored = 0
+        now = time.time()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    stored += 1
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if record.get('expires', 0) > now:
+                        entries[record['key']] = record
+        except OSError:
+            pass
+        
+        # 只保留最新的MAX_ENTRIES条
+        if len(entries) > self.MAX_ENTRIES:
+            entries = dict(list(entries.items())[-self.MAX_ENTRIES:])
+        self._entries = entries
+        
+        if stored > 2 * len(entries) + self.MAX_ENTRIES // 4:
+            self._rewrite()
+        return entries
+    
+    def _rewrite(self):
+        """用内存中的条目原子地重写缓存文件"""
+        import json
+        
+        try:
+            tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in self._entries.values()))
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+    
+    def get(self, key: str):
+        """返回缓存的响应，未命中或已过期返回None"""
+        import time
+        
+        record = self._load().get(key)
+        if record is not None and record['expires'] > time.time():
+            self.stats["hits"] += 1
+            return record['response']
+        self.stats["misses"] += 1
+        return None
+    
+    def put(self, key: str, response: str):
+        """保存响应并追加写入缓存文件，写入失败时忽略"""
+        import json
+        import time
+        
+        entries = self._load()
+        record = {"key": key, "expires": time.time() + self.ttl, "response": response}
+        entries.pop(key, None)
+        entries[key] = record
+        if len(entries) > self.MAX_ENTRIES:
+            del entries[next(iter(entries))]
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
+
+
+# 全局响应缓存实例
+_llm_cache = None
+
+
+def get_llm_cache() -> LLMCache:
+    """获取全局响应缓存实例（单例模式）"""
+    global _llm_cache
+    if _llm_cache is None:
+        with _singleton_lock:
+            if _llm_cache is None:
+                _llm_cache = LLMCache()
+    return _llm_cache
+
+
+class SemanticCache:
+    """
+    基于本地向量嵌入的语义缓存：与已缓存提示的余弦相似度达到阈值即直接返回其响应
+    需要numpy和fastembed；嵌入和scope存于$XDG_CACHE_HOME/llmi/semcache.npz，
+    响应按ID追加写入同目录的semcache.jsonl
+    """
+    
+    MODEL_NAME = "BAAI/bge-small-en-v1.5"
+    THRESHOLD = 0.92
+    MAX_ENTRIES = 4096
+    
+    def __init__(self, path=None, threshold: float = None):
+        import numpy as np
+        from pathlib import Path
+        
+        if path is None:
+            cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+            path = os.path.join(cache_home, 'llmi', 'semcache.npz')
+        self.path = Path(path)
+        self.responses_path = self.path.with_suffix('.jsonl')
+        self.threshold = threshold if threshold is not None else float(
+            os.environ.get('LLMI_SEMANTIC_THRESHOLD', self.THRESHOLD))
+        self.stats = {"hits": 0, "misses": 0}
+        self._np = np
+        self._model = None
+        self._last = (None, None)
+        
+        # embeddings为归一化后的(N, dim)矩阵，scopes/ids/responses与其逐行对应
+        self._embeddings = None
+        self._scopes = []
+        self._ids = []
+        self._responses = []
+        self._dirty = False
+        self._load()
+    
+    def _load(self):
+        """读入嵌入矩阵及其对应的响应；响应文件中失效的行较多时顺带压缩"""
+        import json
+        
+        np = self._np
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                embeddings = data['embeddings']
+                scopes = data['scopes'].tolist()
+                ids = data['ids'].tolist()
+        except (OSError, KeyError, ValueError):
+            return
+        
+        wanted = set(ids)
+        responses = {}
+        stored = 0
+        try:
+            with open(self.responses_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    stored += 1
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if record.get('id') in wanted:
+                        responses[record['id']] = record['response']
+        except OSError:
+            return
+        
+        # 丢弃响应缺失的行（例如另一进程写入中途失败）
+        keep = [i for i, entry_id in enumerate(ids) if entry_id in responses]
+        self._embeddings = embeddings[keep] if keep else None
+        self._scopes = [scopes[i] for i in keep]
+        self._ids = [ids[i] for i in keep]
+        self._responses = [responses[ids[i]] for i in keep]
+        
+        if stored > 2 * len(keep) + self.MAX_ENTRIES // 4:
+            self._rewrite_responses()
+    
+    def _rewrite_responses(self):
+        """只保留仍在使用的响应，原子地重写响应文件"""
+        import json
+        
+        try:
+            tmp_path = self.responses_path.with_name(f"{self.responses_path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write("".join(
+                    json.dumps({"id": entry_id, "response": response}, ensure_ascii=False) + "\n"
+                    for entry_id, response in zip(self._ids, self._responses)
+                ))
+            os.replace(tmp_path, self.responses_path)
+        except OSError:
+            pass
+    
+    def _embed(self, text: str):
+        """计算归一化的嵌入向量，同一文本连续查询/保存时只计算一次"""
+        if self._last[0] == text:
+            return self._last[1]
+        if self._model is None:
+            from fastembed import TextEmbedding
+            self._model = TextEmbedding(self.MODEL_NAME)
+        np = self._np
+        embedding = np.asarray(next(iter(self._model.embed([text]))), dtype=np.float32)
+        embedding /= np.linalg.norm(embedding) or 1.0
+        self._last = (text, embedding)
+        return embedding
+    
+    def get(self, scope: str, prompt: str):
+        """在同一scope（模型、系统提示及其他参数相同）内查找相似提示的响应，未命中返回None"""
+        if self._embeddings is not None and len(self._responses):
+            np = self._np
+            sims = self._embeddings @ self._embed(prompt)
+            sims[np.asarray(self._scopes) != scope] = -1.0
+            best = int(np.argmax(sims))
+            if sims[best] >= self.threshold:
+                self.stats["hits"] += 1
+                return self._responses[best]
+        self.stats["misses"] += 1
+        return None
+    
+    def put(self, scope: str, prompt: str, response: str):
+        """
+        保存提示的嵌入与响应；响应立即追加到磁盘，索引（嵌入矩阵）留待flush()写回
+        写入失败时忽略
+        """
+        import json
+        
+        np = self._np
+        embedding = self._embed(prompt)[None, :]
+        if self._embeddings is None:
+            self._embeddings = embedding
+        else:
+            self._embeddings = np.vstack([self._embeddings, embedding])[-self.MAX_ENTRIES:]
+        # 随机ID避免多个进程同时写入时冲突
+        entry_id = os.urandom(8).hex()
+        self._scopes = (self._scopes + [scope])[-self.MAX_ENTRIES:]
+        self._ids = (self._ids + [entry_id])[-self.MAX_ENTRIES:]
+        self._responses = (self._responses + [response])[-self.MAX_ENTRIES:]
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # 先追加响应，稍后写回的索引引用的响应总已落盘
+            with open(self.responses_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({"id": entry_id, "response": response}, ensure_ascii=False) + "\n")
+        except OSError:
+            return
+        self._dirty = True
+    
+    def flush(self):
+        """
+        把索引写回磁盘，写入失败时忽略
+        整个矩阵可达数MB，因此不在每次put时重写，而是批量调用结束和进程退出时各写一次
+        """
+        if not self._dirty:
+            return
+        np = self._np
+        try:
+            # 嵌入向量几乎不可压缩，直接保存省去压缩开销
+            tmp_path = self.path.with_name(f"{self.path.stem}.{os.getpid()}.tmp.npz")
+            np.savez(
+                tmp_path,
+                embeddings=self._embeddings,
+                scopes=np.asarray(self._scopes),
+                ids=np.asarray(self._ids)
+            )
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except OSError:
+            pass
+
+
+# 全局语义缓存实例；False表示未启用或缺少依赖
+_semantic_cache = None
+
+
+def get_semantic_cache():
+    """获取全局语义缓存实例（LLMI_SEMANTIC_CACHE=1时启用），未启用或缺少依赖时返回None"""
+    global _semantic_cache
+    if _semantic_cache is None:
+        with _singleton_lock:
+            if _semantic_cache is None:
+                cache = False
+                if os.environ.get('LLMI_SEMANTIC_CACHE') == '1':
+                    try:
+                        import atexit
+                        import fastembed  # noqa: F401
+                        cache = SemanticCache()
+                        atexit.register(cache.flush)
+                    except ImportError:
+                        print("⚠️ 语义缓存需要安装numpy和fastembed: pip install fastembed")
+                _semantic_cache = cache
+    return _semantic_cache or None
+
+
+def _should_cache(params: dict, cache: bool = None) -> bool:
+    """显式指定cache时以其为准，否则只缓存temperature<=0的确定性请求"""
+    if cache is not None:
+        return cache
+    return params.get('temperature', 1) <= 0
+
+
+def _cache_lookup(params: dict, cache: bool = None) -> tuple:
+    """
+    依次查询精确缓存和语义缓存
+    返回 (命中的响应或None, 未命中时传给_cache_store的键)
+    """
+    exact_key = None
+    if _should_cache(params, cache):
+        exact_key = LLMCache.make_key(params)
+        hit = get_llm_cache().get(exact_key)
+        if hit is not None:
+            return hit, None
+    
+    semantic_key = None
+    # 语义缓存与精确缓存同样只用于确定性请求：相近但不同的提示（如共享前缀的翻译分片）不能互相顶替
+    semantic = get_semantic_cache() if _should_cache(params, cache) else None
+    if semantic is not None:
+        # 语义匹配只比较最后一条用户消息，其余参数须完全一致
+        prompt = params['messages'][-1]['content']
+        scope = LLMCache.make_key({**params, "messages": params['messages'][:-1]})
+        hit = semantic.get(scope, prompt)
+        if hit is not None:
+            return hit, None
+        semantic_key = (scope, prompt)
+    
+    return None, (exact_key, semantic_key)
+
+
+def _cache_store(keys, content: str):
+    """将新响应写入_cache_lookup未命中的缓存"""
+    if keys is None or content is None:
+        return
+    exact_key, semantic_key = keys
+    if exact_key is not None:
+        get_llm_cache().put(exact_key, content)
+    if semantic_key is not None:
+        get_semantic_cache().put(*semantic_key, content)
+
+
+@functools.lru_cache(maxsize=32)
+def _system_message(system_prompt: str) -> dict:
+    """
+    缓存系统消息字典：技能通常以模块常量反复传入同一系统提示
+    返回的字典被多次请求共享，不应修改
+    """
+    return {"role": "system", "content": system_prompt}
+
+
+def _env_list(name: str) -> list:
+    """读取逗号分隔的环境变量，忽略空项"""
+    return [item.strip() for item in os.environ.get(name, '').split(',') if item.strip()]
+
+
+def _llm_endpoints() -> list:
+    """
+    解析LLM端点列表，返回 (api_key, base_url) 元组列表
+    LLM_API_KEY_LIST/LLM_BASE_URL_LIST按位置配对，只给一项时与另一列表的每一项配对；
+    未设置时退回LLM_API_KEY/LLM_BASE_URL
+    """
+    keys = _env_list('LLM_API_KEY_LIST') or _env_list('LLM_API_KEY')
+    urls = _env_list('LLM_BASE_URL_LIST') or _env_list('LLM_BASE_URL')
+    if not keys or not urls:
+        return []
+    
+    if len(keys) == 1:
+        keys = keys * len(urls)
+    elif len(urls) == 1:
+        urls = urls * len(keys)
+    elif len(keys) != len(urls):
+        raise ValueError(f"❌ LLM_API_KEY_LIST有{len(keys)}项，LLM_BASE_URL_LIST有{len(urls)}项，数量不一致")
+    return list(zip(keys, urls))
 
 
 class LLMMRuntime:
@@ -13,32 +560,65 @@ class LLMMRuntime:
     
     def __init__(self):
         """初始化LLM客户端，使用llmi的环境变量"""
-        api_key = os.environ.get('LLM_API_KEY')
-        base_url = os.environ.get('LLM_BASE_URL')
+        endpoints = _llm_endpoints()
         model_name = os.environ.get('LLM_MODEL_NAME', 'doubao-seed-1.6-flash')
         
-        if not api_key or not base_url:
+        if not endpoints:
             raise ValueError("❌ 缺少LLM环境变量，请先运行: source llm-switch")
         
-        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        # 延迟导入：技能只在真正调用LLM时才加载openai
+        from openai import OpenAI
+        api_key, base_url = endpoints[0]
+        self.client = OpenAI(api_key=api_key, base_url=base_url, http_client=_get_http_client(), max_retries=0)
         self.model_name = model_name
+        self._endpoints = endpoints
+        # 异步客户端按需创建，只有并发调用时才需要；多个端点时轮流分派请求
+        self._aclients = None
+        self._aclient_rr = None
     
-    def chat_completion(self, prompt: str, system_prompt: str = None, **kwargs) -> str:
-        """
-        发送聊天完成请求
-        
-        Args:
-            prompt: 用户提示
-            system_prompt: 系统提示（可选）
-            **kwargs: 其他OpenAI参数
-            
-        Returns:
-            LLM响应文本
-        """
+    @property
+    def endpoint_count(self) -> int:
+        """配置的端点数量"""
+        return len(self._endpoints)
+    
+    @property
+    def aclients(self) -> list:
+        """每个端点一个异步OpenAI客户端（首次访问时创建）"""
+        if self._aclients is None:
+            import itertools
+            from openai import AsyncOpenAI
+            self._aclients = [
+                AsyncOpenAI(
+                    api_key=api_key,
+                    base_url=base_url,
+                    http_client=_new_async_http_client(),
+                    max_retries=0
+                )
+                for api_key, base_url in self._endpoints
+            ]
+            self._aclient_rr = itertools.cycle(self._aclients)
+        return self._aclients
+    
+    @property
+    def aclient(self):
+        """异步OpenAI客户端；配置了多个端点时每次访问轮换到下一个"""
+        aclients = self.aclients
+        return next(self._aclient_rr) if len(aclients) > 1 else aclients[0]
+    
+    async def aclose(self):
+        """关闭异步客户端；其连接绑定在当前事件循环上，下次访问时重新创建"""
+        if self._aclients is not None:
+            aclients = self._aclients
+            self._aclients = self._aclient_rr = None
+            for aclient in aclients:
+                await aclient.close()
+    
+    def _chat_params(self, prompt: str, system_prompt: str = None, **kwargs) -> dict:
+        """构建聊天完成请求参数"""
         messages = []
         
         if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
+            messages.append(_system_message(system_prompt))
         
         messages.append({"role": "user", "content": prompt})
         
@@ -52,9 +632,149 @@ class LLMMRuntime:
         
         # 合并用户参数
         default_params.update(kwargs)
+        return default_params
+    
+    def chat_completion(self, prompt: str, system_prompt: str = None, cache: bool = None,
+                        stream: bool = False, **kwargs):
+        """
+        发送聊天完成请求
         
-        response = self.client.chat.completions.create(**default_params)
-        return response.choices[0].message.content
+        Args:
+            prompt: 用户提示
+            system_prompt: 系统提示（可选）
+            cache: 是否使用响应缓存，默认只缓存temperature<=0的请求
+            stream: 为True时返回逐段产出文本的生成器，首段到达即可处理
+            **kwargs: 其他OpenAI参数
+            
+        Returns:
+            LLM响应文本；stream=True时为文本片段的迭代器
+        """
+        params = self._chat_params(prompt, system_prompt, **kwargs)
+        hit, cache_keys = _cache_lookup(params, cache)
+        if hit is not None:
+            return iter([hit]) if stream else hit
+        
+        if stream:
+            return self._stream_completion(params, cache_keys)
+        
+        response = _create_with_retry(self.client, params)
+        content = response.choices[0].message.content
+        _cache_store(cache_keys, content)
+        return content
+    
+    def _stream_completion(self, params: dict, cache_keys):
+        """流式请求，逐段产出文本；完整收到后写入缓存"""
+        parts = []
+        for chunk in _create_with_retry(self.client, {**params, "stream": True}):
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+        _cache_store(cache_keys, "".join(parts))
+    
+    async def achat_completion(self, prompt: str, system_prompt: str = None, cache: bool = None,
+                               aclient=None, **kwargs) -> str:
+        """chat_completion的异步版本，参数和返回值相同；aclient指定使用的端点客户端，默认轮流分派"""
+        params = self._chat_params(prompt, system_prompt, **kwargs)
+        hit, cache_keys = _cache_lookup(params, cache)
+        if hit is not None:
+            return hit
+        
+        response = await _acreate_with_retry(aclient or self.aclient, params)
+        content = response.choices[0].message.content
+        _cache_store(cache_keys, content)
+        return content
+    
+    def submit_batch(self, prompts: list, **kwargs) -> str:
+        """
+        通过Batch API提交一批离线请求（24小时内完成，通常费用更低），适合不着急的大批量任务
+        
+        Args:
+            prompts: 提示列表，每项为 (prompt, system_prompt) 元组或单独的prompt字符串
+            **kwargs: 传给每个请求的其他参数
+            
+        Returns:
+            batch_id，供retrieve_batch查询结果
+        """
+        import json
+        import tempfile
+        
+        with tempfile.NamedTemporaryFile('w+b', suffix='.jsonl') as f:
+            for i, item in enumerate(prompts):
+                prompt, system_prompt = (item, None) if isinstance(item, str) else item
+                request = {
+                    "custom_id": f"req-{i}",
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": self._chat_params(prompt, system_prompt, **kwargs)
+                }
+                f.write(json.dumps(request, ensure_ascii=False).encode('utf-8') + b"\n")
+            f.flush()
+            f.seek(0)
+            input_file = self.client.files.create(file=f.file, purpose='batch')
+        
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint='/v1/chat/completions',
+            completion_window='24h',
+            # 记录提交数量，结果按它对齐，服务端计数为0时也不会丢项
+            metadata={"llmi_count": str(len(prompts))}
+        )
+        return batch.id
+    
+    def retrieve_batch(self, batch_id: str, wait: bool = True, max_interval: float = 300.0) -> list:
+        """
+        获取Batch API的结果，按提交顺序返回响应文本；失败的项为对应的异常对象
+        
+        Args:
+            batch_id: submit_batch返回的ID
+            wait: 为True时以指数退避轮询直到批处理结束，否则未结束时立即返回None
+            max_interval: 轮询间隔上限（秒）
+        
+        Raises:
+            RuntimeError: 批处理整体失败（如输入文件未通过校验）
+        """
+        import json
+        import time
+        
+        interval = 5.0
+        while True:
+            batch = self.client.batches.retrieve(batch_id)
+            if batch.status in ('completed', 'failed', 'expired', 'cancelled'):
+                break
+            if not wait:
+                return None
+            time.sleep(interval)
+            interval = min(interval * 2, max_interval)
+        
+        if batch.status == 'failed':
+            errors = [e.message for e in (batch.errors.data or [])] if batch.errors else []
+            raise RuntimeError(f"❌ 批处理失败: {'; '.join(filter(None, errors)) or batch_id}")
+        
+        results = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                index = int(record['custom_id'].rsplit('-', 1)[1])
+                response = record.get('response') or {}
+                if record.get('error') or response.get('status_code', 200) >= 400:
+                    error = record.get('error') or response.get('body')
+                    results[index] = RuntimeError(f"批处理请求失败: {error}")
+                else:
+                    results[index] = response['body']['choices'][0]['message']['content']
+        
+        count = int((batch.metadata or {}).get('llmi_count') or 0)
+        if not count:
+            total = batch.request_counts.total if batch.request_counts else 0
+            count = max(total, max(results, default=-1) + 1)
+        missing = RuntimeError(f"批处理未返回结果 (状态: {batch.status})")
+        return [results.get(i, missing) for i in range(count)]
 
 
 # 全局LLM运行时实例
@@ -65,7 +785,9 @@ def get_llm_runtime() -> LLMMRuntime:
     """获取全局LLM运行时实例（单例模式）"""
     global _llm_runtime
     if _llm_runtime is None:
-        _llm_runtime = LLMMRuntime()
+        with _singleton_lock:
+            if _llm_runtime is None:
+                _llm_runtime = LLMMRuntime()
     return _llm_runtime
 
 
@@ -85,10 +807,69 @@ def call_llm(prompt: str, system_prompt: str = None, **kwargs) -> str:
     return runtime.chat_completion(prompt, system_prompt, **kwargs)
 
 
+async def abatch_call_llm(prompts: list, concurrency: int = 8, **kwargs) -> list:
+    """
+    并发发送多个聊天请求，每个端点同时进行中的请求数不超过concurrency
+    各端点的请求槽从同一队列取提示，慢端点不会积压请求，快端点自然多处理
+    
+    Args:
+        prompts: 提示列表，每项为 (prompt, system_prompt) 元组或单独的prompt字符串
+        concurrency: 每个端点的最大并发数
+        **kwargs: 传给每个请求的其他参数
+        
+    Returns:
+        与prompts顺序一致的结果列表，失败的项为对应的异常对象
+    """
+    import asyncio
+    
+    runtime = get_llm_runtime()
+    results = [None] * len(prompts)
+    # 所有请求槽共享一个迭代器；协程在同一线程内切换，取下一项不需要加锁
+    pending = iter(enumerate(prompts))
+    
+    async def worker(aclient):
+        for index, item in pending:
+            prompt, system_prompt = (item, None) if isinstance(item, str) else item
+            try:
+                results[index] = await runtime.achat_completion(prompt, system_prompt, aclient=aclient, **kwargs)
+            except Exception as e:
+                results[index] = e
+    
+    await asyncio.gather(*(worker(aclient) for aclient in runtime.aclients for _ in range(concurrency)))
+    return results
+
+
+def call_llm_many(prompts: list, concurrency: int = 8, **kwargs) -> list:
+    """
+    abatch_call_llm的同步封装，供普通技能代码调用
+    总耗时取决于最慢的单个请求，而不是所有请求之和
+    """
+    import asyncio
+    
+    async def run():
+        try:
+            return await abatch_call_llm(prompts, concurrency, **kwargs)
+        finally:
+            await get_llm_runtime().aclose()
+            semantic = get_semantic_cache()
+            if semantic is not None:
+                semantic.flush()
+    
+    return asyncio.run(run())
+
+
+@functools.lru_cache(maxsize=1)
 def check_llm_env() -> bool:
-    """检查LLM环境是否配置"""
+    """检查LLM环境是否配置（结果在进程内缓存）"""
     required_vars = ['LLM_API_KEY', 'LLM_BASE_URL']
-    return all(os.environ.get(var) for var in required_vars)
+    return all(os.environ.get(var) or os.environ.get(var + '_LIST') for var in required_vars)
+
+
+# 按扩展名即可确定为二进制的常见格式
+_BINARY_EXTS = frozenset({
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.pdf', '.zip',
+    '.tar', '.gz', '.mp4', '.mov', '.wav', '.mp3'
+})
 
 
 def get_file_content(arg_value) -> dict:
@@ -112,27 +893,37 @@ def get_file_content(arg_value) -> dict:
     from pathlib import Path
     import base64
     
+    import stat
+    
     abs_path = Path(arg_value).expanduser().resolve()
     
-    if not abs_path.exists():
+    # 一次stat完成存在性、类型和大小检查，超过限制的文件不会被打开
+    try:
+        st = abs_path.stat()
+    except FileNotFoundError:
         return {'error': f"文件不存在: {arg_value}"}
     
-    if not abs_path.is_file():
+    if not stat.S_ISREG(st.st_mode):
         return {'error': f"路径不是文件: {arg_value}"}
     
-    file_size = abs_path.stat().st_size
+    file_size = st.st_size
     if file_size > 10 * 1024 * 1024:  # 10MB limit
         return {'error': f"文件过大，超过10MB限制: {arg_value}"}
     
+    # 只读取一次，解码失败时直接对已读入的字节做base64编码
     try:
-        with open(abs_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        is_binary = False
-    except (UnicodeDecodeError, Exception):
-        with open(abs_path, 'rb') as f:
-            binary_content = f.read()
-        content = base64.b64encode(binary_content).decode('utf-8')
-        is_binary = True
+        raw = abs_path.read_bytes()
+    except OSError as e:
+        return {'error': f"读取文件失败: {e}"}
+    
+    # 常见二进制格式跳过注定失败的UTF-8解码
+    if abs_path.suffix.lower() in _BINARY_EXTS:
+        content, is_binary = base64.b64encode(raw).decode('ascii'), True
+    else:
+        try:
+            content, is_binary = raw.decode('utf-8'), False
+        except UnicodeDecodeError:
+            content, is_binary = base64.b64encode(raw).decode('ascii'), True
     
     return {
         'path': str(abs_path),
@@ -156,7 +947,8 @@ class VisionLLMRuntime:
         if not api_key or not base_url:
             raise ValueError("❌ 缺少Vision LLM环境变量，请先运行: llm-switch visionuse <name>")
         
-        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        from openai import OpenAI
+        self.client = OpenAI(api_key=api_key, base_url=base_url, http_client=_get_http_client(), max_retries=0)
         self.model_name = model_name
     
     def generate_image(self, prompt: str, size: str = "1024x1024", **kwargs) -> dict:
@@ -187,7 +979,7 @@ class VisionLLMRuntime:
         default_params.update(kwargs)
         
         try:
-            response = self.client.chat.completions.create(**default_params)
+            response = _create_with_retry(self.client, default_params)
             content = response.choices[0].message.content
             
             # 返回结果
@@ -210,7 +1002,9 @@ def get_vision_llm_runtime() -> VisionLLMRuntime:
     """获取全局Vision LLM运行时实例（单例模式）"""
     global _vision_llm_runtime
     if _vision_llm_runtime is None:
-        _vision_llm_runtime = VisionLLMRuntime()
+        with _singleton_lock:
+            if _vision_llm_runtime is None:
+                _vision_llm_runtime = VisionLLMRuntime()
     return _vision_llm_runtime
 
 
@@ -240,8 +1034,9 @@ def vision_call_llm(prompt: str, size: str = "1024x1024", **kwargs) -> dict:
     return runtime.generate_image(prompt, size, **kwargs)
 
 
+@functools.lru_cache(maxsize=1)
 def check_vision_llm_env() -> bool:
-    """检查Vision LLM环境是否配置"""
+    """检查Vision LLM环境是否配置（结果在进程内缓存）"""
     # 检查Vision专属变量或通用变量
     has_vision = bool(os.environ.get('LLM_VISION_API_KEY') and os.environ.get('LLM_VISION_BASE_URL'))
     has_general = bool(os.environ.get('LLM_API_KEY') and os.environ.get('LLM_BASE_URL'))
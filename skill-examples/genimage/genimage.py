@@ -7,19 +7,37 @@
 
 import sys
 import os
+import re
 import base64
+import string
+import types
 from pathlib import Path
 from datetime import datetime
 
 
+# 分块解码Base64时每块的字符数（4的倍数，解码后约48KiB）
+_B64_CHUNK_CHARS = 64 * 1024
+
+# Base64字母表（含填充符）
+_B64_ALPHABET = (string.ascii_letters + string.digits + '+/=').encode('ascii')
+
+# 常见的Base64图像格式
+_B64_PATTERNS = (
+    re.compile(r'data:image/[^;]+;base64,([A-Za-z0-9+/=]+)'),  # data URL格式
+    re.compile(r'!\[.*?\]\(data:image/[^;]+;base64,([A-Za-z0-9+/=]+)\)'),  # Markdown图像
+)
+
 # 比例到尺寸的映射
-RATIO_TO_SIZE = {
+RATIO_TO_SIZE = types.MappingProxyType({
     "1:1": "1024x1024",
     "16:9": "1280x720",
     "9:16": "720x1280",
     "4:3": "1216x896",
     "3:4": "896x1216",
-}
+})
+
+# 直接传入的尺寸格式，如 "1024x1024"
+_SIZE_RE = re.compile(r'\d{3,5}x\d{3,5}')
 
 
 def main(args):
@@ -47,7 +65,7 @@ def main(args):
         # 转换比例为尺寸
         if ratio in RATIO_TO_SIZE:
             size = RATIO_TO_SIZE[ratio]
-        elif "x" in ratio:
+        elif _SIZE_RE.fullmatch(ratio):
             # 直接传入尺寸格式 如 "1024x1024"
             size = ratio
         else:
@@ -87,9 +105,7 @@ def main(args):
             
             # 如果返回了图像数据
             if 'image_data' in result:
-                image_data = base64.b64decode(result['image_data'])
-                with open(output_path, 'wb') as f:
-                    f.write(image_data)
+                write_base64(result['image_data'], output_path)
                 print(f"✅ 图像已保存到: {output_path}")
                 return True
             
@@ -99,10 +115,17 @@ def main(args):
                 # 尝试下载图像
                 try:
                     import requests
-                    response = requests.get(result['image_url'], timeout=30)
-                    response.raise_for_status()
-                    with open(output_path, 'wb') as f:
-                        f.write(response.content)
+                    # 流式写盘，不在内存中保留整张图像
+                    with requests.get(result['image_url'], timeout=30, stream=True) as response:
+                        response.raise_for_status()
+                        try:
+                            with open(output_path, 'wb') as f:
+                                for chunk in response.iter_content(chunk_size=65536):
+                                    f.write(chunk)
+                        except Exception:
+                            # 不留下写了一半的图像
+                            output_path.unlink(missing_ok=True)
+                            raise
                     print(f"✅ 图像已保存到: {output_path}")
                 except Exception as e:
                     print(f"⚠️ 下载图像失败: {e}")
@@ -142,42 +165,88 @@ def main(args):
         return False
 
 
+def _is_base64_text(text: str) -> bool:
+    """判断文本是否只由Base64字符组成；删除字母表字符后为空即是，整个过程在C层完成"""
+    # 非ASCII字符替换为'?'，保证不会被误判为Base64
+    return not text.encode('ascii', 'replace').translate(None, _B64_ALPHABET)
+
+
+def _b64_chunks(b64: str, start: int, end: int):
+    """按4字符对齐逐块产出b64[start:end]的解码结果，块内的换行等空白会被去掉"""
+    import binascii
+    
+    carry = ''
+    for i in range(start, end, _B64_CHUNK_CHARS):
+        chunk = carry + ''.join(b64[i:min(i + _B64_CHUNK_CHARS, end)].split())
+        cut = len(chunk) - len(chunk) % 4
+        yield binascii.a2b_base64(chunk[:cut])
+        carry = chunk[cut:]
+    if carry:
+        yield binascii.a2b_base64(carry)
+
+
+def write_base64(b64: str, output_path: Path, start: int = 0, end: int = None):
+    """
+    分块解码Base64并直接写入文件，内存占用与图像大小无关
+    只解码b64[start:end]，避免先复制出整段Base64字符串；解码失败时删除写了一半的文件
+    输出文件预先扩展到解码后大小的上限并mmap，解码结果直接落入页缓存，最后截断到实际长度
+    """
+    import mmap
+    
+    if end is None:
+        end = len(b64)
+    # 上限：不计空白和填充时的解码长度
+    max_size = (end - start + 3) // 4 * 3
+    try:
+        with open(output_path, 'w+b') as f:
+            if max_size == 0:
+                return
+            f.truncate(max_size)
+            offset = 0
+            with mmap.mmap(f.fileno(), max_size, access=mmap.ACCESS_WRITE) as mm:
+                for data in _b64_chunks(b64, start, end):
+                    mm[offset:offset + len(data)] = data
+                    offset += len(data)
+            f.truncate(offset)
+    except Exception:
+        output_path.unlink(missing_ok=True)
+        raise
+
+
 def extract_and_save_image(content: str, output_path: Path) -> bool:
     """从内容中提取Base64图像并保存"""
-    import re
-    
     # 尝试匹配常见的Base64图像格式
-    patterns = [
-        r'data:image/[^;]+;base64,([A-Za-z0-9+/=]+)',  # data URL格式
-        r'!\[.*?\]\(data:image/[^;]+;base64,([A-Za-z0-9+/=]+)\)',  # Markdown图像
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, content)
+    for pattern in _B64_PATTERNS:
+        match = pattern.search(content)
         if match:
             try:
-                image_data = base64.b64decode(match.group(1))
-                with open(output_path, 'wb') as f:
-                    f.write(image_data)
+                write_base64(content, output_path, match.start(1), match.end(1))
                 return True
             except Exception:
                 continue
     
     # 尝试直接解析整个内容为Base64（如果看起来像Base64）
-    content_stripped = content.strip()
-    if len(content_stripped) > 100 and all(c in 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/=' for c in content_stripped[:100]):
-        try:
-            image_data = base64.b64decode(content_stripped)
-            # 检查是否是有效的图像（PNG或JPEG魔数）
-            if image_data[:8] == b'\x89PNG\r\n\x1a\n' or image_data[:2] == b'\xff\xd8':
-                with open(output_path, 'wb') as f:
-                    f.write(image_data)
-                return True
-        except Exception:
-            pass
+    # 不strip整段内容：只跳过开头的空白，结尾空白会在分块解码时被丢弃
+    start = 0
+    while start < len(content) and content[start].isspace():
+        start += 1
+    if len(content) - start <= 100 or not _is_base64_text(content[start:start + 100]):
+        return False
     
-    return False
-
+    # 先只解码开头44个字符（33字节）检查PNG或JPEG魔数，不是图像就不再解码其余内容
+    head = ''.join(content[start:start + 128].split())[:44]
+    try:
+        head = base64.b64decode(head + '=' * (-len(head) % 4))
+    except Exception:
+        return False
+    if head[:8] != b'\x89PNG\r\n\x1a\n' and head[:2] != b'\xff\xd8':
+        return False
+    
+    try:
+        write_base64(content, output_path, start)
+        return True
+    except Exception:
+        return False
 
 if __name__ == "__main__":
     main(sys.argv[1:])
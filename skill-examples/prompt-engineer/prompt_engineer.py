@@ -7,33 +7,8 @@
 import sys
 
 
-def main(args):
-    """提示词工程技能的主函数"""
-    # 导入llmi运行时API
-    import llmi_runtime
-
-    try:
-        # 解析参数
-        if len(args) == 0:
-            print("❌ 请提供原始提示词")
-            print("Usage: llmi prompt-engineer \"你的原始提示词\"")
-            return False
-
-        # 获取用户输入的原始提示词
-        original_prompt = args[0]
-
-        if not original_prompt.strip():
-            print("⚠️ 提示词内容为空")
-            return True
-
-        print("🔍 原始提示词:")
-        print("=" * 60)
-        print(original_prompt)
-        print("=" * 60)
-        print()
-
-        # 构建系统提示词（严格遵循 prompt.md 的规则）
-        system_prompt = """你是一名“图像生成 Prompt 工程师”，任务是将用户提供的【原始提示词】整理、重构为一个【高约束、低歧义、可被图像生成模型稳定遵循的提示词】。
+# 系统提示词（严格遵循 prompt.md 的规则），模块级常量，每次调用复用同一对象
+SYSTEM_PROMPT = """你是一名“图像生成 Prompt 工程师”，任务是将用户提供的【原始提示词】整理、重构为一个【高约束、低歧义、可被图像生成模型稳定遵循的提示词】。
 
 请严格遵循以下原则进行整理：
 
@@ -67,6 +42,32 @@ def main(args):
 - 描述整体风格、颜色、质感、氛围
 - 明确风格不能覆盖或以上约束"""
 
+
+def main(args):
+    """提示词工程技能的主函数"""
+    # 导入llmi运行时API
+    import llmi_runtime
+
+    try:
+        # 解析参数
+        if len(args) == 0:
+            print("❌ 请提供原始提示词")
+            print("Usage: llmi prompt-engineer \"你的原始提示词\"")
+            return False
+
+        # 获取用户输入的原始提示词
+        original_prompt = args[0]
+
+        if not original_prompt.strip():
+            print("⚠️ 提示词内容为空")
+            return True
+
+        print("🔍 原始提示词:")
+        print("=" * 60)
+        print(original_prompt)
+        print("=" * 60)
+        print()
+
         # 构建用户提示词
         user_prompt = f"【原始提示词如下】\n<<<\n{original_prompt}\n>>>\n\n现在开始整理并输出【最终约束性 Prompt】。"
 
@@ -76,7 +77,7 @@ def main(args):
 
         optimized_prompt = llmi_runtime.call_llm(
             prompt=user_prompt,
-            system_prompt=system_prompt
+            system_prompt=SYSTEM_PROMPT
         )
 
         print("✨ 优化后的提示词:")
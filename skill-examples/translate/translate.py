@@ -4,20 +4,60 @@
 专注于业务逻辑，LLM接入完全交给llmi
 """
 
+import os
 import sys
 from pathlib import Path
 
 
+SYSTEM_PROMPT = "你是一个专业的翻译助手，请准确翻译用户提供的文本，保持原有的格式和结构。"
+
+# 每个分片的最大字符数，超过则按段落拆分后并发翻译
+MAX_SHARD_CHARS = 4000
+
+
+def _split_by_paragraph(content: str, max_chars: int = MAX_SHARD_CHARS) -> list:
+    """
+    在空行处切分内容，使每个分片不超过max_chars；超长的单个段落独占一片
+    每个分片都是content的一次切片，不生成逐段落的中间列表
+    """
+    shards = []
+    start = 0
+    while True:
+        if len(content) - start <= max_chars:
+            shards.append(content[start:])
+            return shards
+        # 窗口内最后一个空行，使content[start:cut]不超过max_chars
+        cut = content.rfind("\n\n", start, start + max_chars + 2)
+        if cut <= start:
+            cut = content.find("\n\n", start + 1)
+            if cut < 0:
+                shards.append(content[start:])
+                return shards
+        shards.append(content[start:cut])
+        start = cut + 2
+
+
+def build_translate_prompt(content: str, target_lang: str, source_lang: str = None) -> str:
+    """构建翻译prompt（纯业务逻辑）"""
+    if source_lang:
+        return f"请将以下{source_lang}内容翻译成{target_lang}，保持原文格式：\n\n{content}"
+    return f"请将以下内容翻译成{target_lang}，保持原文格式：\n\n{content}"
+
+
 def main(args):
     """翻译技能的主函数"""
     # 导入llmi运行时API
     import llmi_runtime
     
     try:
+        # --stream：边生成边输出并写入结果文件
+        stream = '--stream' in args
+        args = [arg for arg in args if arg != '--stream']
+        
         # 解析参数
         if len(args) == 0:
             print("❌ 请提供要翻译的文件")
-            print("Usage: llmi translate <file> [target_lang] [source_lang]")
+            print("Usage: llmi translate <file> [target_lang] [source_lang] [--stream]")
             return False
         
         # 获取文件参数（可能已由llmi预处理）
@@ -45,25 +85,50 @@ def main(args):
             print(f"🌐 源语言: {source_lang}")
         print()
         
-        # 构建翻译prompt（纯业务逻辑）
-        if source_lang:
-            prompt = f"请将以下{source_lang}内容翻译成{target_lang}，保持原文格式：\n\n{content}"
-        else:
-            prompt = f"请将以下内容翻译成{target_lang}，保持原文格式：\n\n{content}"
+        # 保存翻译结果（使用原始文件名）
+        original_path = Path(file_info['path'])
+        output_path = original_path.parent / f"{original_path.stem}_{target_lang}{original_path.suffix}"
         
         # 通过llmi调用LLM（完全透明！）
-        system_prompt = "你是一个专业的翻译助手，请准确翻译用户提供的文本，保持原有的格式和结构。"
-        translation = llmi_runtime.call_llm(prompt, system_prompt)
+        shards = _split_by_paragraph(content)
+        if stream:
+            # 按顺序逐个分片流式翻译，收到的片段直接写入结果文件
+            print("📝 翻译结果:")
+            print("=" * 50)
+            with open(output_path, 'w', encoding='utf-8') as f:
+                for i, shard in enumerate(shards):
+                    if i:
+                        f.write("\n\n")
+                        sys.stdout.write("\n\n")
+                    prompt = build_translate_prompt(shard, target_lang, source_lang)
+                    for delta in llmi_runtime.call_llm(prompt, SYSTEM_PROMPT, stream=True):
+                        f.write(delta)
+                        f.flush()
+                        sys.stdout.write(delta)
+                        sys.stdout.flush()
+            print()
+            print("=" * 50)
+            print(f"\n✅ 翻译完成，结果已保存到: {output_path}")
+            return True
+        
+        if len(shards) == 1:
+            translation = llmi_runtime.call_llm(build_translate_prompt(content, target_lang, source_lang), SYSTEM_PROMPT)
+        else:
+            # 长文本按段落分片并发翻译，再按原顺序拼接
+            print(f"✂️ 内容较长，拆分为 {len(shards)} 个分片并发翻译")
+            prompts = [(build_translate_prompt(shard, target_lang, source_lang), SYSTEM_PROMPT) for shard in shards]
+            concurrency = int(os.environ.get('LLMI_MAX_CONCURRENCY', 8))
+            results = llmi_runtime.call_llm_many(prompts, concurrency=concurrency)
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+            translation = "\n\n".join(results)
         
         print("📝 翻译结果:")
         print("=" * 50)
         print(translation)
         print("=" * 50)
         
-        # 保存翻译结果（使用原始文件名）
-        from pathlib import Path
-        original_path = Path(file_info['path'])
-        output_path = original_path.parent / f"{original_path.stem}_{target_lang}{original_path.suffix}"
         with open(output_path, 'w', encoding='utf-8') as f:
             f.write(translation)
         